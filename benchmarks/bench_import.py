@@ -0,0 +1,135 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD.
+# See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Benchmarks the startup cost of short-lived processes that use the parser, e.g.
+mainfile matchers and batch workers. Every case runs in a fresh interpreter and reports
+the time and number of loaded modules after importing, matching and a first parse:
+
+    python -m benchmarks.bench_import --output after.json --compare before.json
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+
+from .bench_parser import git_commit
+from .synthetic_log import generate
+
+
+cases = {
+    'package': 'import bigdftparser',
+    'parser': 'from bigdftparser import BigDFTParser',
+    'match': (
+        'from bigdftparser import BigDFTParser\n'
+        'buffer = open(mainfile, "rb").read(2048)\n'
+        'BigDFTParser().is_mainfile(mainfile, "text/plain", buffer, buffer.decode(), None)'),
+    'parse': (
+        'from nomad.datamodel import EntryArchive\n'
+        'from bigdftparser import BigDFTParser\n'
+        'BigDFTParser().parse(mainfile, EntryArchive(), None)')}
+
+child = '''
+import sys, time, json
+mainfile = sys.argv[2]
+start = time.perf_counter()
+exec(sys.argv[1])
+print(json.dumps(dict(time=time.perf_counter() - start, modules=len(sys.modules))))
+'''
+
+
+def run_case(statement, mainfile, repeat=5):
+    '''
+    Runs the statement in fresh interpreters and returns the fastest time and the
+    number of loaded modules.
+    '''
+    results = []
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, '-c', child, statement, mainfile], cwd=os.getcwd())
+        results.append(json.loads(output.decode().strip().splitlines()[-1]))
+    return dict(
+        time=min(result['time'] for result in results), modules=results[0]['modules'])
+
+
+def import_times(statement, mainfile, n=15):
+    '''
+    Returns the n modules with the largest cumulative import time in microseconds.
+    '''
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', child, statement, mainfile],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True).stderr.decode()
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((int(cumulative), name.strip()))
+    return sorted(modules, reverse=True)[:n]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_import')
+    parser.add_argument('--cases', nargs='*', default=list(cases.keys()), help='named cases to run')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--importtime', action='store_true', help='list the slowest imports of every case')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare with')
+    args = parser.parse_args(argv)
+
+    results = dict(
+        commit=git_commit(), python=platform.python_version(), machine=platform.machine(),
+        timestamp=time.time(), cases=[])
+    with tempfile.TemporaryDirectory() as directory:
+        mainfile = os.path.join(directory, 'small.out')
+        with open(mainfile, 'w') as f:
+            generate(f)
+
+        for name in args.cases:
+            case = dict(name=name, **run_case(cases[name], mainfile, repeat=args.repeat))
+            results['cases'].append(case)
+            print('%-10s %8.3fs %6d modules' % (name, case['time'], case['modules']), file=sys.stderr)
+            if args.importtime:
+                for cumulative, module in import_times(cases[name], mainfile):
+                    print('    %10.3fs %s' % (cumulative / 1e6, module), file=sys.stderr)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = {case['name']: case for case in json.load(f)['cases']}
+        print('%-10s %12s %12s %8s' % ('case', 'before (s)', 'after (s)', 'ratio'))
+        for case in results['cases']:
+            before = baseline.get(case['name'])
+            if before is not None:
+                print('%-10s %12.4f %12.4f %8.2f' % (
+                    case['name'], before['time'], case['time'], case['time'] / before['time']))
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
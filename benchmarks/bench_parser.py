@@ -0,0 +1,205 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD.
+# See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Benchmarks BigDFTParser on synthetic logs. Every case reports the time and peak
+python memory of the phases (indexing, loading and extraction, populating the archive)
+and of the full parse, together with the throughput. Results are written as JSON and
+can be compared with the results of another commit:
+
+    python -m benchmarks.bench_parser --output after.json --compare before.json
+'''
+
+import os
+import sys
+import gc
+import json
+import mmap
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+import tracemalloc
+
+from nomad.datamodel import EntryArchive
+
+from bigdftparser import BigDFTParser, ScfHistory
+from bigdftparser.yaml_reader import iter_documents
+
+from .synthetic_log import generate
+
+
+cases = {
+    'small': dict(n_atoms=8, n_scf=10, n_steps=1, bc='free'),
+    'atoms': dict(n_atoms=5000, n_scf=10, n_steps=1, bc='periodic'),
+    'scf': dict(n_atoms=8, n_scf=1000, n_steps=1, bc='free'),
+    'steps': dict(n_atoms=64, n_scf=10, n_steps=200, bc='surface')}
+
+
+def run_phases(mainfile, options=None):
+    '''
+    Runs the parser phase by phase and returns the duration of each phase.
+    '''
+    options = options or dict()
+    parser = BigDFTParser(**options)
+    context = parser._context(mainfile, EntryArchive())
+    times = dict()
+
+    with open(mainfile, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            start = time.perf_counter()
+            documents = list(iter_documents(buffer))
+            times['index'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            records = list(parser._extract_records(context, documents))
+            times['extract'] = time.perf_counter() - start
+            del documents
+
+    start = time.perf_counter()
+    parser._parse_records(context, records)
+    times['populate'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    BigDFTParser(**options).parse(mainfile, EntryArchive(), None)
+    times['parse'] = time.perf_counter() - start
+
+    return times
+
+
+def measure_memory(mainfile, options=None):
+    '''
+    Returns the peak python memory of each phase measured with tracemalloc.
+    '''
+    options = options or dict()
+    memory = dict()
+    parser = BigDFTParser(**options)
+    context = parser._context(mainfile, EntryArchive())
+
+    def measure(name, func):
+        gc.collect()
+        tracemalloc.start()
+        result = func()
+        memory[name] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result
+
+    with open(mainfile, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            documents = measure('index', lambda: list(iter_documents(buffer)))
+            records = measure('extract', lambda: list(parser._extract_records(context, documents)))
+            del documents
+
+    measure('populate', lambda: parser._parse_records(context, records))
+    measure('parse', lambda: BigDFTParser(**options).parse(mainfile, EntryArchive(), None))
+
+    return memory
+
+
+def run_case(name, directory, repeat=3, options=None, **kwargs):
+    mainfile = os.path.join(directory, '%s.out' % name)
+    with open(mainfile, 'w') as f:
+        generate(f, **kwargs)
+    size = os.path.getsize(mainfile)
+
+    # the fastest of several runs is the least disturbed one
+    times = dict()
+    for _ in range(repeat):
+        for phase, duration in run_phases(mainfile, options).items():
+            times[phase] = min(times.get(phase, duration), duration)
+    memory = measure_memory(mainfile, options)
+
+    return dict(
+        name=name, parameters=kwargs, size=size,
+        phases={phase: dict(time=times[phase], peak_memory=memory[phase]) for phase in times},
+        throughput=dict(
+            mb_per_s=size / 1e6 / times['parse'], entries_per_s=1 / times['parse'],
+            steps_per_s=kwargs.get('n_steps', 1) / times['parse']))
+
+
+def compare(results, baseline):
+    baseline_cases = {case['name']: case for case in baseline['cases']}
+    print('%-10s %-10s %12s %12s %8s' % ('case', 'phase', 'before (s)', 'after (s)', 'ratio'))
+    for case in results['cases']:
+        before = baseline_cases.get(case['name'])
+        if before is None:
+            continue
+        for phase, values in case['phases'].items():
+            if phase not in before['phases']:
+                continue
+            time_before = before['phases'][phase]['time']
+            print('%-10s %-10s %12.4f %12.4f %8.2f' % (
+                case['name'], phase, time_before, values['time'], values['time'] / time_before))
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_parser')
+    parser.add_argument('--cases', nargs='*', default=list(cases.keys()), help='named cases to run')
+    parser.add_argument('--atoms', type=int, help='run a custom case with this number of atoms')
+    parser.add_argument('--scf', type=int, default=10, help='SCF iterations per step of the custom case')
+    parser.add_argument('--steps', type=int, default=1, help='ionic steps of the custom case')
+    parser.add_argument('--bc', default='free', choices=['free', 'surface', 'periodic'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--scf-history', help='policy for the kept SCF iterations: all, last=N or samples=N')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare with')
+    args = parser.parse_args(argv)
+
+    selected = {name: cases[name] for name in args.cases}
+    if args.atoms is not None:
+        selected = {'custom': dict(n_atoms=args.atoms, n_scf=args.scf, n_steps=args.steps, bc=args.bc)}
+
+    options = dict()
+    if args.scf_history is not None:
+        options['scf_history'] = ScfHistory.from_string(args.scf_history)
+
+    results = dict(
+        commit=git_commit(), python=platform.python_version(), machine=platform.machine(),
+        timestamp=time.time(), cases=[])
+    with tempfile.TemporaryDirectory() as directory:
+        for name, parameters in selected.items():
+            case = run_case(name, directory, repeat=args.repeat, options=options, **parameters)
+            results['cases'].append(case)
+            print('%-10s %8.2f MB %8.2f MB/s %s' % (
+                name, case['size'] / 1e6, case['throughput']['mb_per_s'], ', '.join(
+                    '%s %.3fs/%.1fMB' % (phase, values['time'], values['peak_memory'] / 1e6)
+                    for phase, values in case['phases'].items())), file=sys.stderr)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
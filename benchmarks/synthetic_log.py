@@ -0,0 +1,138 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD.
+# See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+'''
+Generator for synthetic BigDFT logs that follow the layout of real BigDFT 1.8 output.
+The number of atoms, SCF iterations per step, ionic steps and the boundary conditions
+can be scaled independently. The output is deterministic for a given seed.
+'''
+
+import random
+
+
+header = ''' Code logo:
+   "__________________________________ A fast and precise DFT wavelet code
+   |     |     |     |     |     |
+   |_____|__:__|__:__|_____|_____|___ BBBBB          i     g         g
+   |_____|_____|_____|_____|_____|______                    www.bigdft.org   "
+ Reference Paper                       : The Journal of Chemical Physics 129, 014109 (2008)
+ Version Number                        : 1.8
+ Timestamp of this run                 : 2016-11-11 13:02:23.583
+ Root process Hostname                 : synthetic
+ Number of MPI tasks                   :  {mpi}
+ OpenMP parallelization                :  Yes
+ Maximal OpenMP threads per MPI task   :  {omp}
+ Compilation options:
+   Configure arguments:
+     " 'FCFLAGS=-O2 -fopenmp'"
+   Compilers (CC, FC, CXX)             :  [ gcc, gfortran, g++ ]
+ dft:
+   hgrids: [0.45, 0.45, 0.45] #                   Grid spacing in the three directions (bohr)
+   rmult: [5., 8.] #                              c(f)rmult*radii_cf(:,1(2))=coarse(fine) atom-based radius
+   ixc                                 : {ixc} #      Exchange-correlation parameter (LDA=1,PBE=11)
+   qcharge                             : 0 #      Charge of the system. Can be integer or real.
+   nspin                               : 1 #      Spin polarization treatment
+   itermax                             : {itermax} #     Max. iterations of wfn. opt. steps
+ Atomic System Properties:
+   Number of atomic types              :  {n_types}
+   Number of atoms                     :  {n_atoms}
+   Types of atoms                      :  [ {types} ]
+   Boundary Conditions                 : {bc} #Code: {bc_code}
+ DFT parameters:
+   eXchange Correlation:
+     XC ID                             :  &ixc  {ixc}
+     Exchange-Correlation reference    : "XC: Teter 93"
+ Communication checks:
+   Transpositions                      :  Yes
+   Reverse transpositions              :  Yes
+ Estimated Memory Peak (MB)            :  {memory}
+'''
+
+boundary_conditions = {
+    'free': ('Free', 'F'), 'surface': ('Surface', 'S'), 'periodic': ('Periodic', 'P')}
+
+symbols = ['C', 'H', 'N', 'O', 'Si']
+
+
+def _iteration(rng, n, final=False):
+    energies = [rng.uniform(-30, 30) for _ in range(6)]
+    return (
+        '       -  %s{ #---------------------------------------------------------------------- iter: %d\n'
+        ' GPU acceleration:  No, Total electronic charge:  %.12f,\n'
+        ' Poisson Solver: {BC: Free, Box:  [  91,  91,  101 ], MPI tasks:  1},\n'
+        ' Hamiltonian Applied:  Yes, Orthoconstraint:  Yes, Preconditioning:  Yes,\n'
+        ' Energies: {Ekin:  %.11E, Epot: %.11E, Enl:  %.11E,\n'
+        '              EH:  %.11E,  EXC: %.11E, EvXC: %.11E},\n'
+        ' iter:  %d, EKS: %.17E, gnrm:  %.2E, D: %.2E,\n'
+        ' DIIS weights: [ 1.00E+00,  1.00E+00], Orthogonalization Method:  0}\n') % (
+            '&FINAL%03d  ' % n if final else '', n, rng.uniform(9, 10), *energies,
+            n, rng.uniform(-20, -19), rng.uniform(0, 1e-1), rng.uniform(-1e-2, 0))
+
+
+def generate(f, n_atoms=8, n_scf=10, n_steps=1, bc='free', seed=0):
+    '''
+    Writes a synthetic BigDFT log to the text file object f.
+    '''
+    rng = random.Random(seed)
+    types = symbols[:max(1, min(len(symbols), n_atoms))]
+    labels = [types[n % len(types)] for n in range(n_atoms)]
+    cell = [max(5.0, n_atoms ** (1 / 3) * 3.0)] * 3
+    bc_name, bc_code = boundary_conditions[bc]
+
+    for step in range(n_steps):
+        f.write('---\n')
+        if step == 0:
+            f.write(header.format(
+                mpi=rng.randint(1, 64), omp=rng.randint(1, 8), ixc=1, itermax=max(50, n_scf),
+                n_types=len(types), n_atoms=n_atoms, types=', '.join(types), bc=bc_name,
+                bc_code=bc_code, memory=rng.randint(10, 10000)))
+
+        f.write(' Atomic structure:\n   Units                               : angstroem\n')
+        if bc != 'free':
+            f.write('   Cell                                :  [  %.1f,  %s,  %.1f ]\n' % (
+                cell[0], '.inf' if bc == 'surface' else '%.1f' % cell[1], cell[2]))
+        f.write('   Positions:\n')
+        for n, label in enumerate(labels):
+            position = [rng.uniform(0, length) for length in cell]
+            f.write('   - %s: [ %.9f,  %.9f,  %.9f] # [  %.2f,  %.2f,  %.2f ] %04d\n' % (
+                label, *position, *[x / 0.45 for x in position], n + 1))
+        f.write('   Rigid Shift Applied (AU)            :  [  6.7500,  6.7500,  6.8215 ]\n')
+        f.write(
+            ' Sizes of the simulation domain:\n'
+            '   AU                                  :  [  %.3f,  %.3f,  %.3f ]\n'
+            '   Angstroem                           :  [  %.4f,  %.4f,  %.4f ]\n' % (
+                *[x / 0.529177 for x in cell], *cell))
+
+        f.write(
+            ' Ground State Optimization:\n'
+            ' - Hamiltonian Optimization: &itrp%03d\n'
+            '   - Subspace Optimization: &itrep%03d-01\n'
+            '       Wavefunctions Iterations:\n' % (step + 1, step + 1))
+        for n in range(1, n_scf + 1):
+            f.write(_iteration(rng, n, final=n == n_scf))
+        f.write('       Non-Hermiticity of Hamiltonian in the Subspace:  4.03E-31\n')
+        f.write(' Last Iteration                        : *FINAL%03d\n' % n_scf)
+
+        f.write(' Atomic Forces (Ha/Bohr):\n')
+        for n, label in enumerate(labels):
+            f.write(' -  {%s: [%.12E, %.12E, %.12E]} # %04d\n' % (
+                label, *[rng.uniform(-1e-1, 1e-1) for _ in range(3)], n + 1))
+        f.write(' Energy (Hartree)                      : %.17E\n' % rng.uniform(-1e3, -1))
+        f.write(' Force Norm (Hartree/Bohr)             :  %.17E\n' % rng.uniform(0, 1))
+        f.write(' Walltime since initialization         : 00:00:03.590597331\n')
@@ -16,4 +16,27 @@
 # limitations under the License.
 #
 
-from .bigdft_parser import BigDFTParser
+import importlib
+from typing import TYPE_CHECKING
+
+__version__ = '1.0'
+
+# the modules and their dependencies are only imported once a name is used
+_exports = dict(
+    BigDFTParser='bigdft_parser', ResultCache='cache', LogFollower='follow', ScfHistory='scf')
+
+__all__ = list(_exports.keys())
+
+if TYPE_CHECKING:
+    # the names for static analysis, at runtime they are resolved by __getattr__
+    from .bigdft_parser import BigDFTParser
+    from .cache import ResultCache
+    from .follow import LogFollower
+    from .scf import ScfHistory
+
+
+def __getattr__(name):
+    module = _exports.get(name)
+    if module is None:
+        raise AttributeError('module %s has no attribute %s' % (__name__, name))
+    return getattr(importlib.import_module('.%s' % module, __name__), name)
@@ -19,14 +19,60 @@
 import sys
 import json
 import logging
+import argparse
 
 from nomad.utils import configure_logging
 from nomad.datamodel import EntryArchive
-from bigdftparser import BigDFTParser
+from bigdftparser import BigDFTParser, ScfHistory
+from bigdftparser.batch import find_mainfiles, parse_files
+from bigdftparser.output import write_msgpack
 
 
 if __name__ == "__main__":
-    configure_logging(console_log_level=logging.DEBUG)
-    archive = EntryArchive()
-    BigDFTParser().parse(sys.argv[1], archive, logging)
-    json.dump(archive.m_to_dict(), sys.stdout, indent=2)
+    parser = argparse.ArgumentParser(prog='python -m bigdftparser')
+    parser.add_argument('paths', nargs='*', help='mainfiles, or with --batch also directories and globs')
+    parser.add_argument(
+        '--batch', action='store_true',
+        help='parse all given entries in a worker pool and write one JSON line per entry')
+    parser.add_argument('--files-from', help='file with one path per line, - for stdin')
+    parser.add_argument('--processes', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--output-dir', help='write the archives to per-entry files in this directory')
+    parser.add_argument('--cache', help='directory of the result cache')
+    parser.add_argument(
+        '--format', choices=['json', 'msgpack'], default='json',
+        help='msgpack writes a compact binary archive with numpy arrays as raw buffers')
+    parser.add_argument(
+        '--scf-history', type=ScfHistory.from_string,
+        help='stream the SCF iterations and keep all, last=N or samples=N of them')
+    parser.add_argument('--max-size', type=int, help='only parse the header of larger files, in bytes')
+    parser.add_argument('--max-time', type=float, help='parse time budget per file, in seconds')
+    parser.add_argument('--max-memory', type=int, help='memory growth budget per file, in bytes')
+    args = parser.parse_args()
+    options = dict(
+        scf_history=args.scf_history, max_size=args.max_size, max_time=args.max_time,
+        max_memory=args.max_memory)
+
+    if not args.batch:
+        if len(args.paths) != 1:
+            parser.error('exactly one mainfile is required without --batch')
+        configure_logging(console_log_level=logging.DEBUG)
+        archive = EntryArchive()
+        BigDFTParser(**options).parse(args.paths[0], archive, logging)
+        if args.format == 'msgpack':
+            write_msgpack(archive, sys.stdout.buffer)
+        else:
+            json.dump(archive.m_to_dict(), sys.stdout, indent=2)
+        sys.exit(0)
+
+    if args.format == 'msgpack' and args.output_dir is None:
+        parser.error('--format msgpack requires --output-dir with --batch')
+
+    paths = list(args.paths)
+    if args.files_from is not None:
+        with (sys.stdin if args.files_from == '-' else open(args.files_from)) as f:
+            paths.extend(line.strip() for line in f if line.strip())
+
+    parse_files(
+        find_mainfiles(paths), sys.stdout, n_processes=args.processes,
+        output_directory=args.output_dir, cache_directory=args.cache,
+        output_format=args.format, **options)
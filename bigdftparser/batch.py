@@ -0,0 +1,192 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD.
+# See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import glob
+import hashlib
+import json
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from nomad.datamodel import EntryArchive
+
+from .bigdft_parser import BigDFTParser
+from .cache import ResultCache
+from .yaml_reader import open_compressed
+from .output import write_msgpack
+
+
+compression_names = {'GzipFile': 'gz', 'BZ2File': 'bz2', 'LZMAFile': 'xz'}
+
+
+class _ErrorHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.errors = []
+
+    def emit(self, record):
+        self.errors.append(record.getMessage())
+
+
+# every worker process reuses a single parser instance
+_parser = None
+_logger = logging.getLogger('bigdftparser.batch')
+_handler = _ErrorHandler()
+_logger.addHandler(_handler)
+_logger.propagate = False
+
+
+def _init_worker(cache_directory=None, options=None):
+    global _parser
+    cache = ResultCache(cache_directory) if cache_directory is not None else None
+    _parser = BigDFTParser(cache=cache, **(options or {}))
+
+
+def is_mainfile(parser, filepath):
+    try:
+        compressed = open_compressed(filepath)
+        compression = None
+        if compressed is not None:
+            with compressed as f:
+                buffer = f.read(2048)
+            compression = compression_names.get(type(compressed).__name__)
+        else:
+            with open(filepath, 'rb') as f:
+                buffer = f.read(2048)
+    except Exception:
+        return False
+
+    return parser.is_mainfile(
+        filepath, 'text/plain', buffer, buffer.decode('utf-8', 'replace'), compression)
+
+
+def find_mainfiles(paths):
+    '''
+    Expands the given files, directories and glob patterns into mainfile paths. Files
+    found in directories are only used if they match as a BigDFT mainfile.
+    '''
+    parser = BigDFTParser()
+    for path in paths:
+        if glob.has_magic(path):
+            candidates = sorted(glob.glob(path, recursive=True))
+        else:
+            candidates = [path]
+
+        for candidate in candidates:
+            if os.path.isdir(candidate):
+                for root, dirs, files in os.walk(candidate):
+                    dirs.sort()
+                    for name in sorted(files):
+                        filepath = os.path.join(root, name)
+                        if is_mainfile(parser, filepath):
+                            yield filepath
+            else:
+                yield candidate
+
+
+def output_name(mainfile, output_format):
+    '''
+    Returns a bounded, unique file name for the archive of the given mainfile: its
+    base name shortened to 64 characters and a hash of its absolute path.
+    '''
+    path = os.path.abspath(mainfile)
+    digest = hashlib.sha256(path.encode('utf-8', 'surrogateescape')).hexdigest()[:16]
+    return '%s-%s.%s' % (os.path.basename(path)[:64], digest, output_format)
+
+
+def parse_file(mainfile, output_directory=None, output_format='json'):
+    '''
+    Parses a single mainfile with the worker's parser and returns a compact JSON line
+    with the status, timing and either the archive or the path it was written to.
+    Archives are only written as msgpack to an output_directory.
+    '''
+    if _parser is None:
+        _init_worker()
+
+    entry = dict(mainfile=mainfile)
+    _handler.errors = []
+    start = time.time()
+    try:
+        archive = EntryArchive()
+        _parser.parse(mainfile, archive, _logger)
+        entry['parse_time'] = time.time() - start
+        data = archive.m_to_dict() if output_format == 'json' else archive
+        entry['status'] = 'success' if not _handler.errors else 'failure'
+        if entry['status'] == 'success' and len(archive.section_run) > 0 and \
+                (archive.section_run[0].parsing_message_warning_run or '').startswith('partially'):
+            entry['status'] = 'partial'
+    except Exception as e:
+        entry['parse_time'] = time.time() - start
+        entry['status'] = 'failure'
+        _handler.errors.append('%s: %s' % (e.__class__.__name__, e))
+        data = None
+
+    if data is not None:
+        if output_directory is None:
+            entry['archive'] = data
+        else:
+            output = os.path.join(output_directory, output_name(mainfile, output_format))
+            try:
+                if output_format == 'json':
+                    with open(output, 'w') as f:
+                        json.dump(data, f, separators=(',', ':'))
+                else:
+                    with open(output, 'wb') as f:
+                        write_msgpack(data, f)
+                entry['output'] = output
+            except Exception as e:
+                entry['status'] = 'failure'
+                _handler.errors.append('%s: %s' % (e.__class__.__name__, e))
+
+    if _handler.errors:
+        entry['errors'] = _handler.errors
+
+    entry['time'] = time.time() - start
+    return json.dumps(entry, separators=(',', ':'))
+
+
+def parse_files(
+        mainfiles, f_out, n_processes=None, output_directory=None, cache_directory=None,
+        output_format='json', **options):
+    '''
+    Parses the given mainfiles in a pool of worker processes and writes one JSON line
+    per entry to f_out. The options, e.g. scf_history or the budgets max_size, max_time
+    and max_memory, are passed to the parser of each worker.
+    '''
+    if output_directory is not None:
+        os.makedirs(output_directory, exist_ok=True)
+
+    n_processes = os.cpu_count() if n_processes is None else n_processes
+    if n_processes <= 1:
+        _init_worker(cache_directory, options)
+        for mainfile in mainfiles:
+            f_out.write(parse_file(mainfile, output_directory, output_format) + '\n')
+        return
+
+    mainfiles = list(mainfiles)
+    with ProcessPoolExecutor(
+            max_workers=n_processes, initializer=_init_worker,
+            initargs=(cache_directory, options)) as executor:
+        lines = executor.map(
+            parse_file, mainfiles, [output_directory] * len(mainfiles),
+            [output_format] * len(mainfiles),
+            chunksize=max(1, min(64, len(mainfiles) // (4 * n_processes))))
+        for line in lines:
+            f_out.write(line + '\n')
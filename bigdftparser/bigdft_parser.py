@@ -18,25 +18,671 @@
 #
 
 import os
+import re
+import glob
+import bisect
+import mmap
+import time
+import functools
 import logging
 import numpy as np
 from ase.data import chemical_symbols
 import yaml
-try:
-    from yaml import CLoader
-except Exception:
-    pass
 
-from nomad.units import ureg
 from nomad.parsing import FairdiParser
 from nomad.datamodel.metainfo.common_dft import Run, Method, System, XCFunctionals,\
     SingleConfigurationCalculation, ScfIteration
 
+from .cache import SectionCache
+from .instrumentation import Instrumentation, current_rss
+from .metainfo.bigdft import x_bigdft_section_resources, x_bigdft_section_timing
+from .plan import Rule, Plan, populate, unit
+from .scf import ScfHistory
+from .yaml_reader import (
+    Loader, LazyDocument, ItemStream, iter_path, iter_documents, split_documents,
+    load_section, read_atoms, open_compressed, stream_documents, checking, check_progress)
+
+
+step_keys = [
+    'atomic structure', 'energy (hartree)', 'atomic forces (ha/bohr)', 'ground state optimization']
+
+# the memory units of the log are binary
+memory_units = dict(GB=1 << 30, MB=1 << 20, KB=1 << 10, B=1)
+
+
+def _read_atoms(raw):
+    # the atom entries of large systems are tokenized directly from the log, the rest
+    # of the section is loaded as usual
+    atoms = read_atoms(raw.read())
+    if atoms is None:
+        return None
+    labels, vectors, raw = atoms
+    return (labels, vectors), load_section(raw)
+
+
+def _positions(atoms):
+    labels = []
+    positions = []
+    for atom in atoms:
+        for label, position in atom.items():
+            if label in chemical_symbols:
+                labels.append(label)
+                positions.append(position)
+    return np.array(labels, dtype=str), np.array(positions, dtype=np.float64).reshape((-1, 3))
+
+
+def _forces(atoms):
+    return None, np.array([list(atom.values())[0] for atom in atoms], dtype=np.float64)
+
+
+def _memory(value):
+    # e.g. 0 MB 901 KB 816 B
+    return float(sum(
+        int(number) * memory_units.get(name.upper(), 0)
+        for number, name in re.findall(r'(\d+)\s*([A-Za-z]+)', str(value))))
+
+
+# the values of the records and the metainfo quantities they are written to, values
+# without paths are derived from the others in code
+run_rules = [
+    Rule('program_version', [('version number', )], convert=str, default='', target='program_version'),
+    Rule('radical', [('radical', )], convert=str),
+    Rule('data_directory', [('data writing directory', )], convert=str)]
+
+method_rules = [
+    Rule('total_charge', [('dft', 'qcharge')], default=0, target='total_charge'),
+    Rule('scf_max_iteration', [('dft', 'itermax')], default=0, target='scf_max_iteration'),
+    Rule('number_of_spin_channels', [('dft', 'nspin')], default=1, target='number_of_spin_channels'),
+    Rule('xc_id', [('dft', 'xc id'), ('dft', 'ixc')])]
+
+system_rules = [
+    Rule('atoms', [('atomic structure', 'positions')], convert=_positions, raw=_read_atoms),
+    Rule('labels', target='atom_labels'),
+    Rule('positions', target='atom_positions', unit='angstrom'),
+    Rule(
+        'cell', [('atomic structure', 'cell'), ('sizes of the simulation domain', 'angstroem')],
+        convert=np.diag, target='lattice_vectors', unit='angstrom'),
+    Rule(
+        'number_of_atoms', [('atomic system properties', 'number of atoms')],
+        target='number_of_atoms'),
+    Rule('boundary_conditions', [('atomic system properties', 'boundary conditions')]),
+    Rule('periodic', target='configuration_periodic_dimensions')]
+
+# the iterations of all ground state optimization loops, None stands for every item
+# of a list, the dict for the wavefunctions loops of the hamiltonian optimizations and
+# the support function and kernel loops of linear scaling runs. The loop and iteration
+# indices are given in scf_loops, the kind of loop as index into scf_loop_kinds.
+scf_path = (
+    'ground state optimization', None, {
+        'hamiltonian optimization': (None, 'subspace optimization', 'wavefunctions iterations', None),
+        'support function optimization': (None, ),
+        'kernel optimization': (None, )})
+scf_loops = ['ground_state', 'kind', 'hamiltonian', 'iteration']
+scf_loop_kinds = ['wavefunctions', 'support_functions', 'kernel']
+
+scc_rules = [
+    Rule('energy_total', [('energy (hartree)', )], target='energy_total', unit='hartree'),
+    Rule(
+        'forces', [('atomic forces (ha/bohr)', )], convert=_forces, raw=_read_atoms,
+        target='atom_forces', unit='hartree / bohr'),
+    Rule('scf_history', [scf_path[:1]], convert=lambda data: _collect_scf(
+        ScfHistory(), iter_path(data, scf_path[1:]))),
+    Rule('number_of_scf_iterations', target='number_of_scf_iterations'),
+    Rule(
+        'time_calculation', [('timings for root process', 'elapsed time (s)')],
+        target='time_calculation', unit='s')]
+
+# the energies of an scf iteration, given on the iteration or in its energies, kernel
+# iterations of linear scaling runs give the total energy as energy
+scf_rules = [
+    Rule(
+        key, [path for name in names for path in [(name, ), ('energies', name)]],
+        target='%s_scf_iteration' % key, unit='hartree')
+    for names, key in [
+        (['exc'], 'energy_XC'), (['evxc'], 'energy_XC_potential'),
+        (['eh'], 'energy_correction_hartree'), (['ekin'], 'electronic_kinetic_energy'),
+        (['eks', 'energy'], 'energy_total'), (['d'], 'energy_change')]]
+
+# the loop indices of an scf iteration
+scf_loop_rules = [
+    Rule(key, target='x_bigdft_scf_%s' % name)
+    for key, name in [
+        ('ground_state', 'ground_state_loop'), ('kind', 'loop_kind'),
+        ('hamiltonian', 'hamiltonian_loop'), ('iteration', 'iteration_index')]]
+
+# the parallelization, grids and memory estimates of the run
+resource_rules = [
+    Rule('mpi_tasks', [('number of mpi tasks', )], target='x_bigdft_mpi_tasks'),
+    Rule(
+        'openmp_threads', [('maximal openmp threads per mpi task', )],
+        target='x_bigdft_openmp_threads'),
+    Rule(
+        'grid_spacings', [('box grid spacings', )], convert=np.array,
+        target='x_bigdft_grid_spacings', unit='bohr'),
+    Rule(
+        'grid_points', [('sizes of the simulation domain', 'grid spacing units')],
+        convert=np.array, target='x_bigdft_grid_points')] + [
+    Rule(
+        '%s_grid_%s' % (resolution, key),
+        [('wavefunctions descriptors, full simulation domain', '%s resolution grid' % resolution, name)],
+        target='x_bigdft_%s_grid_%s' % (resolution, key))
+    for resolution in ['coarse', 'fine']
+    for name, key in [('no. of points', 'points'), ('no. of segments', 'segments')]] + [
+    Rule(
+        'kernel_%s' % key, [('poisson kernel creation', name), ('poisson kernel initialization', name)],
+        target='x_bigdft_kernel_%s' % key)
+    for name, key in [('mpi tasks', 'mpi_tasks'), ('openmp threads per mpi task', 'openmp_threads')]] + [
+    Rule(
+        key, [('poisson kernel creation', 'memory requirements per mpi task', name)],
+        target='x_bigdft_%s' % key, unit='mebibyte')
+    for name, key in [
+        ('kernel (mb)', 'kernel_memory'), ('density (mb)', 'density_memory'),
+        ('full grid arrays (mb)', 'full_grid_memory')]] + [
+    Rule(
+        'wavefunctions_memory', [('wavefunctions memory occupation for root mpi process', )],
+        convert=_memory, target='x_bigdft_wavefunctions_memory', unit='byte'),
+    Rule(
+        'estimated_memory_peak', [('estimated memory peak (mb)', )],
+        target='x_bigdft_estimated_memory_peak', unit='mebibyte')]
+
+# the columns of the categories of a timing counter
+timing_rules = [
+    Rule('counter', target='x_bigdft_timing_counter'),
+    Rule('total_time', target='x_bigdft_timing_total_time', unit='s'),
+    Rule('categories', target='x_bigdft_timing_categories'),
+    Rule('classes', target='x_bigdft_timing_classes'),
+    Rule('percents', target='x_bigdft_timing_percents'),
+    Rule('times', target='x_bigdft_timing_times', unit='s'),
+    Rule('max_times', target='x_bigdft_timing_max_times', unit='s'),
+    Rule('min_times', target='x_bigdft_timing_min_times', unit='s')]
+
+header_plan = Plan(run_rules + method_rules)
+step_plan = Plan(system_rules + scc_rules)
+scf_plan = Plan(scf_rules)
+# the resources are not released, the domain sizes are also read by the first step
+resource_plan = Plan(resource_rules)
+summary_plan = Plan(run_rules + method_rules + resource_rules + [
+    rule for rule in system_rules if rule.key in ['number_of_atoms', 'boundary_conditions']])
+
+# the header-only pass reads the header sections from the head and the final energy
+# from the tail of the log
+head_size = 1 << 20
+tail_size = 1 << 16
+re_energy = re.compile(rb'^ *Energy \(Hartree\) *: *(\S+)', re.M)
+
+# the input and setup sections that are usually identical in the logs of an upload,
+# they are only loaded once by a parser instance
+static_keys = {
+    'compilation options', 'dft', 'poisson kernel initialization',
+    'properties of atoms in the system', 'basis set definition'}
+
+# all top-level sections that are read by the parser
+section_keys = header_plan.sections | step_plan.sections | resource_plan.sections
+
+
+def create_step_plan(scf_history=None):
+    '''
+    Returns the plan for the ionic steps. With an ScfHistory, the scf iterations are
+    streamed from the raw section and only those kept by its policy are returned.
+    '''
+    if scf_history is None:
+        return step_plan
+
+    def read(raw):
+        iterations = ItemStream(raw.buffer, scf_path, scf_plan.keys(), raw.start, raw.end)
+        scf = _collect_scf(scf_history, iterations)
+        if iterations.truncation is not None:
+            scf['truncation'] = iterations.truncation
+        return scf, None
+
+    rules = [
+        Rule(rule.key, rule.paths, raw=read, convert=lambda data: _collect_scf(
+            scf_history, iter_path(data, scf_path[1:])))
+        if rule.key == 'scf_history' else rule for rule in scc_rules]
+    return Plan(system_rules + rules)
+
+
+def scf_row(indices, iteration):
+    '''
+    Returns the energies and the loop indices of an scf iteration at the given indices of
+    scf_path as a dict, the iterations of linear scaling loops have no hamiltonian index.
+    '''
+    row = scf_plan.extract(iteration)
+    row.update(zip(scf_loops, indices[:-1] + (0, ) * (len(scf_loops) - len(indices)) + indices[-1:]))
+    return row
+
+
+def collect_scf(scf_history, rows):
+    '''
+    Collects the scf rows into the columns kept by scf_history, the loop indices are
+    given in scf_loops.
+    '''
+    scf = scf_history.collect(rows, [rule.key for rule in scf_rules] + scf_loops)
+    scf['scf_loops'] = {
+        key: scf['scf'].pop(key, np.zeros(0)).astype(np.int64) for key in scf_loops}
+    return scf
+
+
+def _collect_scf(scf_history, iterations):
+    def rows():
+        for n_row, (indices, iteration) in enumerate(iterations):
+            if n_row % 100 == 0:
+                check_progress()
+            yield scf_row(indices, iteration)
+
+    return collect_scf(scf_history, rows())
+
+
+periodic_dimensions = {
+    'free': [False, False, False], 'periodic': [True, True, True], 'surface': [True, False, True]}
+
+# the system values that are only given by the first ionic step of a log, the later
+# steps use those of the previous step
+carried_keys = ['number_of_atoms', 'boundary_conditions']
+carried_plan = Plan([rule for rule in system_rules if rule.key in carried_keys])
+
+
+def _periodic(boundary_conditions, cell=None):
+    # logs without boundary conditions are considered periodic
+    if boundary_conditions is None:
+        return periodic_dimensions['periodic']
+    return periodic_dimensions.get(
+        boundary_conditions.lower(), None if cell is None else [True, True, True])
+
+
+def is_step(document):
+    keys = [key.lower() for key in document.keys()]
+    return any(key in keys for key in step_keys)
+
+
+def extract_step(source, plan=step_plan, carried=None):
+    '''
+    Extracts the system and calculation data of a single ionic step into plain python
+    and numpy objects. The scf energies of all loops are given as columns in scf, the
+    ground state loop, kind of loop, hamiltonian loop and iteration index of each in
+    scf_loops.
+
+    The values of carried_keys that the step does not give are taken from the dict
+    carried, which is updated with those it gives for the next step.
+    '''
+    keys = list(source.keys())
+    values = plan.extract(source, release=True)
+    if carried is not None:
+        for key in carried_keys:
+            if values[key] is None:
+                values[key] = carried.get(key)
+            else:
+                carried[key] = values[key]
+
+    system = dict(number_of_atoms=values['number_of_atoms'], cell=values['cell'])
+    if values['atoms'] is not None:
+        labels, positions = values['atoms']
+        # some entries may not be symbols
+        symbols = np.isin(labels, chemical_symbols)
+        if np.any(symbols):
+            system['positions'] = positions[symbols]
+            system['labels'] = labels[symbols]
+
+    system['periodic'] = _periodic(values['boundary_conditions'], values['cell'])
+
+    scc = dict(energy_total=values['energy_total'], time_calculation=values['time_calculation'])
+    incomplete_forces = None
+    if values['forces'] is not None:
+        forces = values['forces'][1]
+        if values['number_of_atoms'] is not None and len(forces) < values['number_of_atoms']:
+            incomplete_forces = next(key for key in keys if key.lower() == 'atomic forces (ha/bohr)')
+        else:
+            scc['forces'] = forces
+    if values['scf_history'] is not None:
+        scc.update(values['scf_history'])
+        position = scc.pop('truncation', None)
+        if position is not None:
+            source.truncate(scf_path[0], position)
+
+    step = dict(system=system, scc=scc)
+    if getattr(source, 'truncation', None) is not None:
+        step['truncation'] = source.truncation
+    elif getattr(source, 'log_end', None) is not None and keys:
+        # a log that is cut at a line boundary ends with a document without the closing
+        # sections of the step or with fewer forces than atoms
+        if incomplete_forces is not None:
+            step['truncation'] = dict(section=incomplete_forces, position=source.log_end)
+        elif 'energy (hartree)' not in [key.lower() for key in keys]:
+            step['truncation'] = dict(section=keys[-1], position=source.log_end)
+    return step
+
+
+def extract_scf(iterations):
+    # the scf history is collected column-wise, one array per energy
+    scf = {rule.key: np.full(len(iterations), np.nan) for rule in scf_rules}
+    for n_iteration, iteration in enumerate(iterations):
+        for key, val in scf_plan.extract(iteration).items():
+            if val is not None:
+                scf[key][n_iteration] = val
+
+    return {key: val for key, val in scf.items() if not np.all(np.isnan(val))}
+
+
+def timings_path(filepath, run):
+    '''
+    Returns the path of the time.yaml file that belongs to the log at filepath, or None
+    if it is not present. It is looked for in the data directory of the run and next to
+    the log, named after the radical of the run.
+    '''
+    directory = os.path.dirname(os.path.abspath(filepath))
+    radical = run.get('radical')
+    name = 'time.yaml' if radical is None else 'time-%s.yaml' % radical
+    directories = [directory]
+    if run.get('data_directory') is not None:
+        directories.insert(0, os.path.join(directory, run['data_directory']))
+    for candidate in directories:
+        path = os.path.normpath(os.path.join(candidate, name))
+        # only files of the entry are read
+        if os.path.commonpath([directory, path]) == directory and os.path.isfile(path):
+            return path
+
+    if radical is None:
+        # logs without a radical may still be next to a single named time file
+        paths = glob.glob(os.path.join(glob.escape(directory), 'time-*.yaml'))
+        if len(paths) == 1:
+            return paths[0]
+    return None
+
+
+def _floats(values):
+    # the values as floats or None if any is not a number
+    try:
+        return [float(value) for value in values]
+    except (TypeError, ValueError):
+        return None
+
+
+def read_timings(path):
+    '''
+    Reads the timing counters, e.g. INIT, WFN_OPT and LAST, of all documents of a
+    time.yaml file. The categories of each counter are given as columns, categories
+    with values that are not numbers are skipped.
+    '''
+    timings = []
+    with open(path, 'rb') as f:
+        for document in yaml.load_all(f, Loader=Loader):
+            if not isinstance(document, dict):
+                continue
+            for counter, value in document.items():
+                if not isinstance(value, dict) or not isinstance(value.get('Categories'), dict):
+                    continue
+                categories = [
+                    (name, category, _floats(category.get('Data') or []))
+                    for name, category in value['Categories'].items()
+                    if isinstance(category, dict) and isinstance(category.get('Data'), list)]
+                categories = [
+                    (name, category) for name, category, row in categories
+                    if row is not None and len(row) >= 2]
+                data = [_floats(category['Data']) for _, category in categories]
+                timing = dict(
+                    counter=str(counter), categories=[str(name) for name, _ in categories],
+                    classes=[str(category.get('Class', '')) for _, category in categories],
+                    percents=np.array([row[0] for row in data], dtype=np.float64),
+                    times=np.array([row[1] for row in data], dtype=np.float64))
+                # the spread over the mpi tasks is only given by parallel runs
+                if data and all(len(row) >= 4 for row in data):
+                    timing['max_times'] = np.array([row[2] for row in data], dtype=np.float64)
+                    timing['min_times'] = np.array([row[3] for row in data], dtype=np.float64)
+                total = value.get('Classes')
+                total = _floats(total.get('Total') or []) if isinstance(total, dict) else None
+                if total is not None and len(total) >= 2:
+                    timing['total_time'] = total[1]
+                timings.append(timing)
+    return timings
+
+
+@functools.lru_cache(maxsize=None)
+def _xc_mapping():
+    # TODO complete mapping
+    return {
+        1: ['LDA_XC_TETER93'],
+        11: ['GGA_C_PBE", "GGA_X_PBE'],
+        12: ['GGA_X_PBE'],
+        15: ['GGA_C_PBE", "GGA_X_RPBE'],
+        16: ['GGA_XC_HCTH_93'],
+        17: ['GGA_XC_HCTH_120'],
+        26: ['GGA_XC_HCTH_147'],
+        27: ['GGA_XC_HCTH_407'],
+        100: ['HF_X'],
+        # libxc
+        "001": "LDA_X",
+        "002": "LDA_C_WIGNER",
+        "003": "LDA_C_RPA",
+        "004": "LDA_C_HL",
+        "005": "LDA_C_GL",
+        "006": "LDA_C_XALPHA",
+        "007": "LDA_C_VWN",
+        "008": "LDA_C_VWN_RPA",
+        "009": "LDA_C_PZ",
+        "010": "LDA_C_PZ_MOD",
+        "011": "LDA_C_OB_PZ",
+        "012": "LDA_C_PW",
+        "013": "LDA_C_PW_MOD",
+        "014": "LDA_C_OB_PW",
+        "015": "LDA_C_2D_AMGB",
+        "016": "LDA_C_2D_PRM",
+        "017": "LDA_C_vBH",
+        "018": "LDA_C_1D_CSC",
+        "019": "LDA_X_2D",
+        "020": "LDA_XC_TETER93",
+        "021": "LDA_X_1D",
+        "101": "GGA_X_PBE",
+        "102": "GGA_X_PBE_R",
+        "103": "GGA_X_B86",
+        "104": "GGA_X_B86_R",
+        "105": "GGA_X_B86_MGC",
+        "106": "GGA_X_B88",
+        "107": "GGA_X_G96",
+        "108": "GGA_X_PW86",
+        "109": "GGA_X_PW91",
+        "110": "GGA_X_OPTX",
+        "111": "GGA_X_DK87_R1",
+        "112": "GGA_X_DK87_R2",
+        "113": "GGA_X_LG93",
+        "114": "GGA_X_FT97_A",
+        "115": "GGA_X_FT97_B",
+        "116": "GGA_X_PBE_SOL",
+        "117": "GGA_X_RPBE",
+        "118": "GGA_X_WC",
+        "119": "GGA_X_mPW91",
+        "120": "GGA_X_AM05",
+        "121": "GGA_X_PBEA",
+        "122": "GGA_X_MPBE",
+        "123": "GGA_X_XPBE",
+        "124": "GGA_X_2D_B86_MGC",
+        "125": "GGA_X_BAYESIAN",
+        "126": "GGA_X_PBE_JSJR",
+        "127": "GGA_X_2D_B88",
+        "128": "GGA_X_2D_B86",
+        "129": "GGA_X_2D_PBE",
+        "130": "GGA_C_PBE",
+        "131": "GGA_C_LYP",
+        "132": "GGA_C_P86",
+        "133": "GGA_C_PBE_SOL",
+        "134": "GGA_C_PW91",
+        "135": "GGA_C_AM05",
+        "136": "GGA_C_XPBE",
+        "137": "GGA_C_LM",
+        "138": "GGA_C_PBE_JRGX",
+        "139": "GGA_X_OPTB88_VDW",
+        "140": "GGA_X_PBEK1_VDW",
+        "141": "GGA_X_OPTPBE_VDW",
+        "160": "GGA_XC_LB",
+        "161": "GGA_XC_HCTH_93",
+        "162": "GGA_XC_HCTH_120",
+        "163": "GGA_XC_HCTH_147",
+        "164": "GGA_XC_HCTH_407",
+        "165": "GGA_XC_EDF1",
+        "166": "GGA_XC_XLYP",
+        "167": "GGA_XC_B97",
+        "168": "GGA_XC_B97_1",
+        "169": "GGA_XC_B97_2",
+        "170": "GGA_XC_B97_D",
+        "171": "GGA_XC_B97_K",
+        "172": "GGA_XC_B97_3",
+        "173": "GGA_XC_PBE1W",
+        "174": "GGA_XC_MPWLYP1W",
+        "175": "GGA_XC_PBELYP1W",
+        "176": "GGA_XC_SB98_1a",
+        "177": "GGA_XC_SB98_1b",
+        "178": "GGA_XC_SB98_1c",
+        "179": "GGA_XC_SB98_2a",
+        "180": "GGA_XC_SB98_2b",
+        "181": "GGA_XC_SB98_2c",
+        "401": "HYB_GGA_XC_B3PW91",
+        "402": "HYB_GGA_XC_B3LYP",
+        "403": "HYB_GGA_XC_B3P86",
+        "404": "HYB_GGA_XC_O3LYP",
+        "405": "HYB_GGA_XC_mPW1K",
+        "406": "HYB_GGA_XC_PBEH",
+        "407": "HYB_GGA_XC_B97",
+        "408": "HYB_GGA_XC_B97_1",
+        "410": "HYB_GGA_XC_B97_2",
+        "411": "HYB_GGA_XC_X3LYP",
+        "412": "HYB_GGA_XC_B1WC",
+        "413": "HYB_GGA_XC_B97_K",
+        "414": "HYB_GGA_XC_B97_3",
+        "415": "HYB_GGA_XC_mPW3PW",
+        "416": "HYB_GGA_XC_B1LYP",
+        "417": "HYB_GGA_XC_B1PW91",
+        "418": "HYB_GGA_XC_mPW1PW",
+        "419": "HYB_GGA_XC_mPW3LYP",
+        "420": "HYB_GGA_XC_SB98_1a",
+        "421": "HYB_GGA_XC_SB98_1b",
+        "422": "HYB_GGA_XC_SB98_1c",
+        "423": "HYB_GGA_XC_SB98_2a",
+        "424": "HYB_GGA_XC_SB98_2b",
+        "425": "HYB_GGA_XC_SB98_2c",
+        "201": "MGGA_X_LTA",
+        "202": "MGGA_X_TPSS",
+        "203": "MGGA_X_M06L",
+        "204": "MGGA_X_GVT4",
+        "205": "MGGA_X_TAU_HCTH",
+        "206": "MGGA_X_BR89",
+        "207": "MGGA_X_BJ06",
+        "208": "MGGA_X_TB09",
+        "209": "MGGA_X_RPP09",
+        "231": "MGGA_C_TPSS",
+        "232": "MGGA_C_VSXC",
+        "301": "LCA_OMC",
+        "302": "LCA_LCH",
+    }
+
+
+def _extract_documents(filepath, documents, first, scf_history=None, carried=None):
+    # runs in a worker process, the documents are read from the file to avoid pickling
+    # them, first is whether they start with the first document of the log and carried
+    # the values of carried_keys given by the documents before
+    plan = create_step_plan(scf_history)
+    carried = dict(carried or {})
+    steps = []
+    with open(filepath, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            for n_document, (start, end) in enumerate(documents):
+                document = LazyDocument(buffer, start, end)
+                if len(document) == 0:
+                    continue
+                if (n_document > 0 or not first) and not is_step(document):
+                    continue
+                try:
+                    steps.append(extract_step(document, plan, carried))
+                except yaml.YAMLError as e:
+                    steps.append(dict(error=str(e)))
+                    break
+    return steps
+
+
+re_system_properties = re.compile(rb'^[ \t]*Atomic System Properties[ \t]*:', re.M)
+
+
+def _carried_values(buffer, documents, indices):
+    # the values of carried_keys at the start of the documents with the given indices,
+    # they are read from the last document before each that gives them, only these
+    # documents are indexed
+    positions = [match.start() for match in re_system_properties.finditer(buffer)]
+    starts = [start for start, _ in documents]
+    loaded = dict()
+    carried = []
+    for index in indices:
+        n_position = bisect.bisect_left(positions, starts[index]) - 1
+        if index == 0 or n_position < 0:
+            carried.append(dict())
+            continue
+        n_document = bisect.bisect_right(starts, positions[n_position]) - 1
+        if n_document not in loaded:
+            values = carried_plan.extract(LazyDocument(buffer, *documents[n_document]))
+            loaded[n_document] = {key: values[key] for key in carried_keys if values[key] is not None}
+        carried.append(loaded[n_document])
+    return carried
+
+
+def _read_ends(filepath):
+    # the complete lines at the head and the tail of the log, the tail of compressed
+    # logs is not read as they would have to be decompressed completely
+    decompressed = open_compressed(filepath)
+    if decompressed is not None:
+        with decompressed as f:
+            head = f.read(head_size)
+        tail = b''
+    else:
+        with open(filepath, 'rb') as f:
+            head = f.read(head_size)
+            f.seek(max(0, os.path.getsize(filepath) - tail_size))
+            tail = f.read()
+    return head[:head.rfind(b'\n') + 1], tail
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+class _ParseContext:
+    '''
+    The state of a single parse call. It is passed along instead of being stored on
+    the parser, so that one parser instance can be used by concurrent parses.
+    '''
+    def __init__(
+            self, filepath, archive, logger, instrumentation, max_time=None, max_memory=None):
+        self.filepath = os.path.abspath(filepath)
+        self.archive = archive
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+        self.instrumentation = instrumentation
+        self.max_time = max_time
+        self.max_memory = max_memory
+        self.start = time.perf_counter()
+        self.start_rss = current_rss() if max_memory is not None else None
+
+    def remaining_time(self):
+        if self.max_time is None:
+            return None
+        return max(0., self.max_time - (time.perf_counter() - self.start))
+
+    def check_budget(self):
+        '''
+        Raises _BudgetExceeded once the parse took longer or grew the resident memory
+        of the process by more than its budget.
+        '''
+        if self.max_time is not None and self.remaining_time() <= 0:
+            raise _BudgetExceeded('time')
+        if self.start_rss is not None:
+            rss = current_rss()
+            if rss is not None and rss - self.start_rss > self.max_memory:
+                raise _BudgetExceeded('memory')
+
 
 class BigDFTParser(FairdiParser):
-    def __init__(self):
+    def __init__(
+            self, n_processes=1, cache=None, profile=None, profiler='cprofile',
+            profile_directory='.', scf_history=None, max_size=None, max_time=None,
+            max_memory=None, section_cache_size=1 << 22, phase_memory=True):
         super().__init__(
             name='parsers/bigdft', code_name='BigDFT', code_homepage='http://bigdft.org/',
+            supported_compressions=['gz', 'bz2', 'xz'],
             mainfile_contents_re=(
                 # r'__________________________________ A fast and precise DFT wavelet code\s*'
                 # r'\|     \|     \|     \|     \|     \|\s*'
@@ -64,272 +710,334 @@ class BigDFTParser(FairdiParser):
                 # r'\|     \|     \|     \|     \|     \|   DDDDDD       F         TTTT\s*'
                 # r'\|_____\|_____\|_____\|_____\|_____\|______                    www\.bigdft\.org'
             ))
-        self.yaml_dict = dict()
-
-        # TODO complete mapping
-        self.xc_mapping = {
-            1: ['LDA_XC_TETER93'],
-            11: ['GGA_C_PBE", "GGA_X_PBE'],
-            12: ['GGA_X_PBE'],
-            15: ['GGA_C_PBE", "GGA_X_RPBE'],
-            16: ['GGA_XC_HCTH_93'],
-            17: ['GGA_XC_HCTH_120'],
-            26: ['GGA_XC_HCTH_147'],
-            27: ['GGA_XC_HCTH_407'],
-            100: ['HF_X'],
-            # libxc
-            "001": "LDA_X",
-            "002": "LDA_C_WIGNER",
-            "003": "LDA_C_RPA",
-            "004": "LDA_C_HL",
-            "005": "LDA_C_GL",
-            "006": "LDA_C_XALPHA",
-            "007": "LDA_C_VWN",
-            "008": "LDA_C_VWN_RPA",
-            "009": "LDA_C_PZ",
-            "010": "LDA_C_PZ_MOD",
-            "011": "LDA_C_OB_PZ",
-            "012": "LDA_C_PW",
-            "013": "LDA_C_PW_MOD",
-            "014": "LDA_C_OB_PW",
-            "015": "LDA_C_2D_AMGB",
-            "016": "LDA_C_2D_PRM",
-            "017": "LDA_C_vBH",
-            "018": "LDA_C_1D_CSC",
-            "019": "LDA_X_2D",
-            "020": "LDA_XC_TETER93",
-            "021": "LDA_X_1D",
-            "101": "GGA_X_PBE",
-            "102": "GGA_X_PBE_R",
-            "103": "GGA_X_B86",
-            "104": "GGA_X_B86_R",
-            "105": "GGA_X_B86_MGC",
-            "106": "GGA_X_B88",
-            "107": "GGA_X_G96",
-            "108": "GGA_X_PW86",
-            "109": "GGA_X_PW91",
-            "110": "GGA_X_OPTX",
-            "111": "GGA_X_DK87_R1",
-            "112": "GGA_X_DK87_R2",
-            "113": "GGA_X_LG93",
-            "114": "GGA_X_FT97_A",
-            "115": "GGA_X_FT97_B",
-            "116": "GGA_X_PBE_SOL",
-            "117": "GGA_X_RPBE",
-            "118": "GGA_X_WC",
-            "119": "GGA_X_mPW91",
-            "120": "GGA_X_AM05",
-            "121": "GGA_X_PBEA",
-            "122": "GGA_X_MPBE",
-            "123": "GGA_X_XPBE",
-            "124": "GGA_X_2D_B86_MGC",
-            "125": "GGA_X_BAYESIAN",
-            "126": "GGA_X_PBE_JSJR",
-            "127": "GGA_X_2D_B88",
-            "128": "GGA_X_2D_B86",
-            "129": "GGA_X_2D_PBE",
-            "130": "GGA_C_PBE",
-            "131": "GGA_C_LYP",
-            "132": "GGA_C_P86",
-            "133": "GGA_C_PBE_SOL",
-            "134": "GGA_C_PW91",
-            "135": "GGA_C_AM05",
-            "136": "GGA_C_XPBE",
-            "137": "GGA_C_LM",
-            "138": "GGA_C_PBE_JRGX",
-            "139": "GGA_X_OPTB88_VDW",
-            "140": "GGA_X_PBEK1_VDW",
-            "141": "GGA_X_OPTPBE_VDW",
-            "160": "GGA_XC_LB",
-            "161": "GGA_XC_HCTH_93",
-            "162": "GGA_XC_HCTH_120",
-            "163": "GGA_XC_HCTH_147",
-            "164": "GGA_XC_HCTH_407",
-            "165": "GGA_XC_EDF1",
-            "166": "GGA_XC_XLYP",
-            "167": "GGA_XC_B97",
-            "168": "GGA_XC_B97_1",
-            "169": "GGA_XC_B97_2",
-            "170": "GGA_XC_B97_D",
-            "171": "GGA_XC_B97_K",
-            "172": "GGA_XC_B97_3",
-            "173": "GGA_XC_PBE1W",
-            "174": "GGA_XC_MPWLYP1W",
-            "175": "GGA_XC_PBELYP1W",
-            "176": "GGA_XC_SB98_1a",
-            "177": "GGA_XC_SB98_1b",
-            "178": "GGA_XC_SB98_1c",
-            "179": "GGA_XC_SB98_2a",
-            "180": "GGA_XC_SB98_2b",
-            "181": "GGA_XC_SB98_2c",
-            "401": "HYB_GGA_XC_B3PW91",
-            "402": "HYB_GGA_XC_B3LYP",
-            "403": "HYB_GGA_XC_B3P86",
-            "404": "HYB_GGA_XC_O3LYP",
-            "405": "HYB_GGA_XC_mPW1K",
-            "406": "HYB_GGA_XC_PBEH",
-            "407": "HYB_GGA_XC_B97",
-            "408": "HYB_GGA_XC_B97_1",
-            "410": "HYB_GGA_XC_B97_2",
-            "411": "HYB_GGA_XC_X3LYP",
-            "412": "HYB_GGA_XC_B1WC",
-            "413": "HYB_GGA_XC_B97_K",
-            "414": "HYB_GGA_XC_B97_3",
-            "415": "HYB_GGA_XC_mPW3PW",
-            "416": "HYB_GGA_XC_B1LYP",
-            "417": "HYB_GGA_XC_B1PW91",
-            "418": "HYB_GGA_XC_mPW1PW",
-            "419": "HYB_GGA_XC_mPW3LYP",
-            "420": "HYB_GGA_XC_SB98_1a",
-            "421": "HYB_GGA_XC_SB98_1b",
-            "422": "HYB_GGA_XC_SB98_1c",
-            "423": "HYB_GGA_XC_SB98_2a",
-            "424": "HYB_GGA_XC_SB98_2b",
-            "425": "HYB_GGA_XC_SB98_2c",
-            "201": "MGGA_X_LTA",
-            "202": "MGGA_X_TPSS",
-            "203": "MGGA_X_M06L",
-            "204": "MGGA_X_GVT4",
-            "205": "MGGA_X_TAU_HCTH",
-            "206": "MGGA_X_BR89",
-            "207": "MGGA_X_BJ06",
-            "208": "MGGA_X_TB09",
-            "209": "MGGA_X_RPP09",
-            "231": "MGGA_C_TPSS",
-            "232": "MGGA_C_VSXC",
-            "301": "LCA_OMC",
-            "302": "LCA_LCH",
-        }
-
-    def _extract(self, name, source, default=None):
-        for key in source.keys():
-            if key.lower() == name.lower():
-                return source.pop(key)
-        return default
-
-    def parse_method(self):
-        sec_method = self.archive.section_run[0].m_create(Method)
-        sec_method.electronic_structure_method = 'DFT'
+        self.n_processes = n_processes
+        self.cache = cache
+        # the policy for the kept scf iterations, None keeps all without streaming
+        self.scf_history = scf_history
+        self.step_plan = create_step_plan(scf_history)
+        # logs above max_size bytes or parses that take longer than max_time seconds or
+        # grow the memory by more than max_memory bytes only get a header-only pass
+        self.max_size = max_size
+        self.max_time = max_time
+        self.max_memory = max_memory
+        # the decoded static sections shared by all parses of this instance
+        self.section_cache = SectionCache(section_cache_size)
+        # phases in profile are run under the given profiler and dumped for every entry,
+        # the memory of the phases is only sampled with phase_memory
+        self.profile_settings = dict(
+            profile=profile, profiler=profiler, profile_directory=profile_directory,
+            memory=phase_memory)
+        # the instrumentation of the last completed parse
+        self.instrumentation = Instrumentation(**self.profile_settings)
 
-        data = self._extract('dft', self.yaml_dict, {})
-        sec_method.total_charge = self._extract('qcharge', data, 0)
-        sec_method.scf_max_iteration = self._extract('itermax', data, 0)
-        sec_method.number_of_spin_channels = self._extract('nspin', data, 1)
+    @property
+    def xc_mapping(self):
+        # the table is only built on first use, matching does not need it
+        return _xc_mapping()
 
-        xc_id = self._extract('xc id', data)
+    def extract_method(self, values):
+        method = {rule.key: values[rule.key] for rule in method_rules if rule.key != 'xc_id'}
+
+        xc_id = values['xc_id']
         if xc_id is None:
-            xc_id = self._extract('ixc', data)
-        if xc_id < 0:
+            xc_functionals = []
+        elif xc_id < 0:
             # libxc
             xc_id = '%06d' % abs(xc_id)
             xc_functionals = [self.xc_mapping.get(xc_id[:3]), self.xc_mapping.get(xc_id[3:])]
         else:
             xc_functionals = self.xc_mapping.get(xc_id, [])
+        method['xc_functionals'] = [f for f in xc_functionals if f is not None]
+
+        return method
+
+    def parse_method(self, sec_run, method):
+        sec_method = sec_run.m_create(Method)
+        sec_method.electronic_structure_method = 'DFT'
+        populate(sec_method, method_rules, method)
 
-        xc_functionals = [f for f in xc_functionals if f is not None]
-        for functional in xc_functionals:
+        for functional in method['xc_functionals']:
             sec_xc_functional = sec_method.m_create(XCFunctionals)
             sec_xc_functional.XC_functional_name = functional
-        sec_method.XC_functional = '_'.join(xc_functionals)
-
-    def parse_system(self):
-        sec_system = self.archive.section_run[0].m_create(System)
-
-        data = self._extract('Atomic structure', self.yaml_dict, {})
-        labels = []
-        positions = []
-        for atom in self._extract('positions', data, []):
-            for label, position in atom.items():
-                if label in chemical_symbols:
-                    # some entries may not be symbols
-                    labels.append(label)
-                    positions.append(position)
-        if labels:
-            sec_system.atom_positions = positions * ureg.angstrom
-            sec_system.atom_labels = labels
-
-        cell = self._extract('cell', data)
-        if cell is None:
-            data = self._extract('Sizes of the simulation domain', self.yaml_dict, {})
-            cell = self._extract('angstroem', data)
-        if cell is not None:
-            sec_system.lattice_vectors = np.diag(cell) * ureg.angstrom
-            sec_system.configuration_periodic_dimensions = [True, True, True]
-
-        data = self._extract('Atomic System Properties', self.yaml_dict, {})
-        sec_system.number_of_atoms = self._extract('number of atoms', data, 0)
-
-        pbc = self._extract('boundary conditions', data, 'Periodic').lower()
-        if pbc == 'free':
-            sec_system.configuration_periodic_dimensions = [False, False, False]
-        elif pbc == 'periodic':
-            sec_system.configuration_periodic_dimensions = [True, True, True]
-        elif pbc == 'surface':
-            sec_system.configuration_periodic_dimensions = [True, False, True]
-
-    def parse_scc(self):
-        sec_scc = self.archive.section_run[0].m_create(SingleConfigurationCalculation)
-
-        energy = self._extract('Energy (Hartree)', self.yaml_dict)
-        if energy is not None:
-            sec_scc.energy_total = energy * ureg.hartree
-
-        forces = self._extract('Atomic Forces (Ha/Bohr)', self.yaml_dict)
-        if forces is not None:
-            sec_scc.atom_forces = [list(f.values())[0] for f in forces] * (ureg.hartree / ureg.bohr)
-
-        data = self._extract('Ground State Optimization', self.yaml_dict, [{}])
-        hamiltonian = self._extract('hamiltonian optimization', data[0])
-        if hamiltonian is None:
+        sec_method.XC_functional = '_'.join(method['xc_functionals'])
+
+    def parse_resources(self, sec_run, resources):
+        sec_resources = sec_run.m_create(x_bigdft_section_resources)
+        populate(sec_resources, resource_rules, resources)
+
+    def parse_timings(self, sec_run, timings):
+        for timing in timings:
+            sec_timing = sec_run.m_create(x_bigdft_section_timing)
+            populate(sec_timing, timing_rules, timing)
+
+    def parse_system(self, sec_run, system):
+        sec_system = sec_run.m_create(System)
+        populate(sec_system, system_rules, system)
+
+    def parse_scc(self, sec_run, scc):
+        sec_scc = sec_run.m_create(SingleConfigurationCalculation)
+        populate(sec_scc, scc_rules, scc)
+
+        n_iterations = scc.get('number_of_scf_iterations')
+        if n_iterations is None:
             return
+        if scc.get('scf_indices') is not None:
+            # only the iterations kept by the scf history policy
+            n_iterations = len(scc['scf_indices'])
+
+        # units are converted once per column, the magnitudes are read as python lists
+        # and the iterations added in one pass without per value numpy indexing
+        quantity_defs = []
+        columns = []
+        for rule in scf_rules:
+            if rule.key in scc['scf']:
+                quantity_def = ScfIteration.m_def.all_quantities[rule.target]
+                val = scc['scf'][rule.key] * unit(rule.unit)
+                quantity_defs.append(quantity_def)
+                columns.append(val.to(quantity_def.unit).magnitude.tolist())
+
+        for rule in scf_loop_rules:
+            loop = scc.get('scf_loops', dict()).get(rule.key)
+            if loop is not None and len(loop) == n_iterations:
+                quantity_defs.append(ScfIteration.m_def.all_quantities[rule.target])
+                columns.append(
+                    [scf_loop_kinds[kind] for kind in loop] if rule.key == 'kind' else loop.tolist())
+
+        sub_section_def = sec_scc.m_def.all_sub_sections['section_scf_iteration']
+        for row in zip(*columns) if columns else [()] * n_iterations:
+            sec_scf = ScfIteration()
+            for quantity_def, val in zip(quantity_defs, row):
+                # nan for energies that are not given in this iteration
+                if val == val:
+                    sec_scf.m_set(quantity_def, val)
+            sec_scc.m_add_sub_section(sub_section_def, sec_scf)
 
-        energy_mapping = {
-            'exc': 'energy_XC', 'evxc': 'energy_XC_potential',
-            'eh': 'energy_correction_hartree', 'ekin': 'electronic_kinetic_energy',
-            'eks': 'energy_total', 'd': 'energy_change'}
-
-        subspace = self._extract('subspace optimization', hamiltonian[0], {})
-        wavefunction = self._extract('wavefunctions iterations', subspace, [])
-        sec_scc.number_of_scf_iterations = len(wavefunction)
-        for iteration in wavefunction:
-            sec_scf = sec_scc.m_create(ScfIteration)
-            energies = self._extract('energies', iteration, {})
-            for key, val in energies.items():
-                key = energy_mapping.get(key.lower())
-                if key is not None:
-                    setattr(sec_scf, '%s_scf_iteration' % key, val * ureg.hartree)
-
-            for key, val in iteration.items():
-                key = energy_mapping.get(key.lower())
-                if key is not None:
-                    setattr(sec_scf, '%s_scf_iteration' % key, val * ureg.hartree)
+    def _context(self, filepath, archive, logger=None):
+        return _ParseContext(
+            filepath, archive, logger, Instrumentation(**self.profile_settings),
+            max_time=self.max_time, max_memory=self.max_memory)
 
     def parse(self, filepath, archive, logger):
-        self.filepath = os.path.abspath(filepath)
-        self.archive = archive
-        self.logger = logger if logger is not None else logging.getLogger(__name__)
+        context = self._context(filepath, archive, logger)
+        try:
+            self._parse(context)
+        finally:
+            self.instrumentation = context.instrumentation
+            context.instrumentation.log(context.logger)
+            if context.instrumentation.profile:
+                context.instrumentation.dump(os.path.basename(context.filepath))
+
+    async def parse_async(self, filepath, archive, logger=None, executor=None):
+        '''
+        Parses in the given executor, the event loop's default thread pool if None,
+        so that an event loop can run many parses concurrently.
+        '''
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(executor, functools.partial(self.parse, filepath, archive, logger))
+
+    def _parse(self, context):
+        n_runs = len(context.archive.section_run)
+        try:
+            if self.max_size is not None and os.path.getsize(context.filepath) > self.max_size:
+                raise _BudgetExceeded('size')
+            # the budget is also checked while large documents are loaded
+            with checking(context.check_budget):
+                self._parse_full(context)
+        except _BudgetExceeded as e:
+            # the partially populated run is replaced
+            section_run = context.archive.m_def.all_sub_sections['section_run']
+            for index in reversed(range(n_runs, len(context.archive.section_run))):
+                context.archive.m_remove_sub_section(section_run, index)
+            context.logger.warning('The %s budget is exceeded, only the header is parsed.' % e)
+            # the header-only pass is cheap and not limited
+            context.max_time = context.start_rss = None
+            with context.instrumentation.phase('header_only'):
+                self._parse_header_only(context, str(e))
+
+    def _parse_header_only(self, context, budget):
+        head, tail = _read_ends(context.filepath)
+        try:
+            document = LazyDocument(head)
+            document.share_sections(self.section_cache, static_keys)
+            values = summary_plan.extract(document, release=True)
+        except yaml.YAMLError as e:
+            context.logger.error('Error loading yaml file.', exc_info=e)
+            return
+
+        energies = re_energy.findall(tail)
+        try:
+            energy = float(energies[-1]) if energies else None
+        except ValueError:
+            energy = None
+
+        system = dict(
+            number_of_atoms=values['number_of_atoms'],
+            periodic=_periodic(values['boundary_conditions']))
+        self._parse_records(context, [
+            self._header_record(values, values),
+            dict(system=system, scc=dict(energy_total=energy))])
+
+        sec_run = context.archive.section_run[-1]
+        sec_run.parsing_message_warning_run = 'partially parsed, the %s budget is exceeded' % budget
+
+    def _parse_full(self, context):
+        if self.cache is not None:
+            key = self.cache.key(
+                context.filepath, '' if self.scf_history is None else repr(self.scf_history))
+            records = self.cache.get(key)
+            if records is not None:
+                # the extracted data is reused, the log is not parsed at all
+                self._parse_records(context, records)
+                return
+
+            self._parse_log(context, lambda records: self.cache.put(key, records))
+        else:
+            self._parse_log(context, lambda records: records)
+
+    def _parse_log(self, context, process):
+        # compressed logs are decompressed while they are read, only the sections that
+        # are parsed are kept in memory
+        decompressed = open_compressed(context.filepath)
+        if decompressed is not None:
+            with decompressed as f:
+                self._parse_records(context, process(self._extract_records(context, stream_documents(
+                    f, section_keys, instrumentation=context.instrumentation))))
+            return
 
-        with open(self.filepath) as f:
+        with open(context.filepath, 'rb') as f:
             try:
-                # we simply load everything at once as the metainfo framework does not
-                # support streaming
-                self.yaml_dict = yaml.load(f, Loader=CLoader)
-            except Exception:
-                try:
-                    self.yaml_dict = yaml.safe_load(f)
-                except Exception:
-                    self.logger.error('Error loading yaml file.')
-                    return
+                # the log is only indexed, sections are loaded when they are accessed
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                context.logger.error('Error loading yaml file.')
+                return
+
+            with buffer:
+                if self.n_processes > 1:
+                    self._parse_records(context, process(self._extract_records_parallel(context, buffer)))
+                else:
+                    self._parse_records(context, process(self._extract_records(
+                        context, iter_documents(buffer, instrumentation=context.instrumentation))))
 
-        sec_run = self.archive.m_create(Run)
+    def _parse_records(self, context, records):
+        # records are the plain data extracted from the log: one for the run and method
+        # followed by one for each ionic step
+        sec_run = context.archive.m_create(Run)
         sec_run.program_name = 'BigDFT'
         sec_run.program_basis_set_type = 'real-space grid'
-        sec_run.program_version = str(self.yaml_dict.pop('Version Number', ''))
 
-        self.parse_method()
-        self.parse_system()
-        self.parse_scc()
+        phase = context.instrumentation.phase
+        for record in records:
+            context.check_budget()
+            if record.get('error') is not None:
+                context.logger.error('Error loading yaml file.', exc_info=Exception(record['error']))
+                break
+
+            if record.get('method') is not None:
+                with phase('method'):
+                    populate(sec_run, run_rules, record)
+                    self.parse_method(sec_run, record['method'])
+                if record.get('resources') is not None:
+                    self.parse_resources(sec_run, record['resources'])
+                # the timings are read when the run is written, also for cached records
+                path = timings_path(context.filepath, record)
+                if path is not None:
+                    with phase('timings'):
+                        try:
+                            self.parse_timings(sec_run, read_timings(path))
+                        except (OSError, yaml.YAMLError, ValueError, TypeError, KeyError) as e:
+                            # the optional timings never fail the entry
+                            context.logger.warning('Error loading timings file.', exc_info=e)
+                continue
+
+            if record.get('truncation') is not None:
+                # the job was killed, the data up to the truncation is still used
+                sec_run.run_clean_end = False
+                context.logger.warning('Log is truncated in %s at byte %d.' % (
+                    record['truncation']['section'], record['truncation']['position']))
+
+            with phase('system'):
+                self.parse_system(sec_run, record['system'])
+            with phase('scc'):
+                self.parse_scc(sec_run, record['scc'])
+
+            with phase('references'):
+                sec_scc = sec_run.section_single_configuration_calculation[-1]
+                sec_scc.single_configuration_calculation_to_system_ref = sec_run.section_system[-1]
+                sec_scc.single_configuration_to_calculation_method_ref = sec_run.section_method[-1]
+
+    def _header_record(self, values, resources):
+        record = {rule.key: values[rule.key] for rule in run_rules}
+        record['method'] = self.extract_method(values)
+        record['resources'] = {rule.key: resources[rule.key] for rule in resource_rules}
+        return record
+
+    def _extract_header(self, context, document):
+        with context.instrumentation.phase('method'):
+            document.share_sections(self.section_cache, static_keys)
+            values = header_plan.extract(document, release=True)
+            return self._header_record(values, resource_plan.extract(document))
 
-        sec_scc = sec_run.section_single_configuration_calculation[-1]
-        sec_scc.single_configuration_calculation_to_system_ref = sec_run.section_system[-1]
-        sec_scc.single_configuration_to_calculation_method_ref = sec_run.section_method[-1]
+    def _extract_records(self, context, documents):
+        # geometry optimizations and MD write one document per ionic step, the
+        # documents are parsed one at a time and released once the step is written
+        carried = dict()
+        for n_document, document in enumerate(documents):
+            context.check_budget()
+            if n_document > 0 and not is_step(document):
+                continue
+
+            try:
+                if n_document == 0:
+                    yield self._extract_header(context, document)
+                with context.instrumentation.phase('step'):
+                    step = extract_step(document, self.step_plan, carried)
+                yield step
+            except yaml.YAMLError as e:
+                yield dict(error=str(e))
+                return
+
+    def _extract_records_parallel(self, context, buffer):
+        # the documents are only split at their markers here, each is indexed and
+        # loaded in a worker process and the results are merged in step order
+        documents = split_documents(buffer)
+        try:
+            # as in serial parsing, documents without sections are skipped
+            n_empty = 0
+            while n_empty < len(documents) and len(LazyDocument(buffer, *documents[n_empty])) == 0:
+                n_empty += 1
+            documents = documents[n_empty:]
+            if not documents:
+                return
+
+            yield self._extract_header(context, LazyDocument(buffer, *documents[0]))
+            n_documents = len(documents)
+            chunksize = max(1, n_documents // (4 * self.n_processes))
+            starts = list(range(0, n_documents, chunksize))
+            chunks = zip(starts, _carried_values(buffer, documents, starts))
+        except yaml.YAMLError as e:
+            yield dict(error=str(e))
+            return
+
+        from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+        executor = ProcessPoolExecutor(max_workers=min(self.n_processes, n_documents))
+        futures = [
+            executor.submit(
+                _extract_documents, context.filepath, documents[start:start + chunksize],
+                start == 0, self.scf_history, carried)
+            for start, carried in chunks]
+        try:
+            for future in futures:
+                try:
+                    steps = future.result(timeout=context.remaining_time())
+                except TimeoutError:
+                    raise _BudgetExceeded('time')
+                yield from steps
+        finally:
+            # a parse that is given up does not wait for the remaining documents
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
@@ -0,0 +1,176 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD.
+# See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import hashlib
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+from bigdftparser import __version__
+
+# the format of the extracted records, it has to be increased with every change to
+# what the records contain, so that entries of older parsers are not reused
+record_format = 7
+
+
+class ResultCache:
+    '''
+    A persistent on-disk cache for the data extracted from BigDFT logs. Entries are
+    keyed by the content hash of the log, the parser version and the record format and
+    hold the extracted records (method, system arrays, scc and scf columns) as a
+    sequence of pickles ended by None. Once the cache exceeds max_size bytes, the least recently used
+    entries are evicted.
+
+    The entries are unpickled, which can execute arbitrary code. The directory must
+    only be writable by trusted users.
+    '''
+    def __init__(
+            self, directory, max_size=1 << 30,
+            version='%s-%d' % (__version__, record_format)):
+        self.directory = directory
+        self.max_size = max_size
+        self.version = version
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, filepath, options=''):
+        # options distinguish the records of differently configured parsers
+        sha = hashlib.sha256((self.version + options).encode())
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, '%s.pickle' % key)
+
+    def get(self, key):
+        '''
+        Returns the list of cached records or None if there is no readable entry.
+        Entries that cannot be read, e.g. truncated ones, are removed.
+        '''
+        path = self._path(key)
+        try:
+            # the modification time is used to track the last access
+            os.utime(path)
+            return self._read(path)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # unpickling can fail with any exception
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+
+    def _read(self, path):
+        # complete entries end with None, entries that end early raise EOFError
+        records = []
+        with open(path, 'rb') as f:
+            while True:
+                record = pickle.load(f)
+                if record is None:
+                    return records
+                records.append(record)
+
+    def put(self, key, records):
+        '''
+        Passes through the given records while writing them to the cache. The entry is
+        only added once all records were written without error.
+        '''
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        complete = False
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for record in records:
+                    if record.get('error') is not None:
+                        yield record
+                        return
+                    pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    yield record
+                pickle.dump(None, f, protocol=pickle.HIGHEST_PROTOCOL)
+            complete = True
+        finally:
+            if complete:
+                os.replace(tmp_path, self._path(key))
+                self.evict()
+            else:
+                os.remove(tmp_path)
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.pickle'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, name in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+
+class SectionCache:
+    '''
+    A bounded in-memory cache for the decoded values of log sections, keyed by the
+    fingerprint of their raw bytes. The logs of an upload often share identical input
+    sections, which are then only loaded once by a parser instance. Once the cached
+    sections exceed max_size raw bytes, the least recently used are evicted. The
+    values are shared and must not be modified.
+    '''
+    def __init__(self, max_size=1 << 22):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, data, load):
+        '''
+        Returns the cached value of the section data or the value returned by load.
+        '''
+        key = hashlib.blake2b(data, digest_size=16).digest()
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is not None:
+                self._values.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        value = load()
+        with self._lock:
+            self.misses += 1
+            if key not in self._values and len(data) <= self.max_size:
+                self._values[key] = (len(data), value)
+                self.size += len(data)
+                while self.size > self.max_size:
+                    self.size -= self._values.popitem(last=False)[1][0]
+        return value
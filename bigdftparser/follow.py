@@ -0,0 +1,257 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD.
+# See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import re
+import mmap
+import time
+import yaml
+
+from .bigdft_parser import (
+    BigDFTParser, step_keys, is_step, extract_step, extract_scf, scf_path, scf_row,
+    collect_scf)
+from .scf import ScfHistory
+from .yaml_reader import LazyDocument, Loader, _Scanner, re_key
+
+
+re_item = re.compile(rb'( *)-[ \t]+(?:&\S+[ \t]*)?')
+
+
+def _scf_indices(path, pattern=scf_path[1:], indices=()):
+    # the indices that iter_path gives for the value at path, the keys and list indices
+    # to it, or None if path is not on the pattern
+    if not pattern or not path:
+        return indices if not pattern and not path else None
+    key = pattern[0]
+    if key is None:
+        if not isinstance(path[0], int):
+            return None
+        return _scf_indices(path[1:], pattern[1:], indices + (path[0], ))
+    if isinstance(key, dict):
+        if path[0] not in key:
+            return None
+        return _scf_indices(path[1:], key[path[0]], indices + (list(key).index(path[0]), ))
+    return _scf_indices(path[1:], pattern[1:], indices) if path[0] == key else None
+
+
+class LogFollower:
+    '''
+    Follows the growing log of a running BigDFT calculation. Every update only reads
+    the complete lines appended since the last update and returns the new records:
+
+    - dict(program_version, method) once the header of the first document is written
+    - dict(step, first_iteration, number_of_scf_iterations, scf) with the scf columns
+      of the iterations of the running ionic step written since the last update
+    - dict(system, scc) once the document of an ionic step is complete, as for
+      BigDFTParser, with the scf iterations collected by the updates
+
+    The last document is only complete with the next document or a final update.
+    The state is a plain picklable dict that can be stored to resume following
+    from another process.
+    '''
+    def __init__(self, filepath, parser=None, state=None, callback=None):
+        self.filepath = filepath
+        self.parser = parser if parser is not None else BigDFTParser()
+        self._context = self.parser._context(filepath, None)
+        self.callback = callback
+        self.state = state if state is not None else self.initial_state()
+        for key, value in self.initial_state().items():
+            self.state.setdefault(key, value)
+
+    @staticmethod
+    def initial_state():
+        return dict(
+            position=0, document_start=0, n_documents=0, n_steps=0, header=False,
+            scanner=_Scanner(), key=None, item_start=None, n_iterations=0, carried=dict(),
+            path=[], item_indices=None, scf_rows=[])
+
+    def update(self, final=False):
+        '''
+        Reads the appended lines and returns the new records. With final, the last
+        document is considered complete, even if it is truncated.
+        '''
+        records = []
+        size = os.path.getsize(self.filepath)
+        if size < self.state['position']:
+            # the log was replaced
+            self.state = self.initial_state()
+
+        if size > 0:
+            with open(self.filepath, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                    records.extend(self._update(buffer, final))
+
+        if self.callback is not None:
+            for record in records:
+                self.callback(record)
+
+        return records
+
+    def follow(self, interval=10., idle_timeout=None):
+        '''
+        Yields the new records while the log grows. Stops with a final update once the
+        log did not grow for idle_timeout seconds.
+        '''
+        last_change = time.time()
+        while True:
+            position = self.state['position']
+            for record in self.update():
+                yield record
+            if self.state['position'] != position:
+                last_change = time.time()
+            elif idle_timeout is not None and time.time() - last_change > idle_timeout:
+                for record in self.update(final=True):
+                    yield record
+                return
+            time.sleep(interval)
+
+    def _update(self, buffer, final):
+        state = self.state
+        scanner = state['scanner']
+        # only complete lines are read, the rest might still be written
+        end = buffer.rfind(b'\n', state['position']) + 1 if not final else len(buffer)
+        position = state['position']
+        iterations = []
+
+        while position < end:
+            line_end = buffer.find(b'\n', position, end)
+            line_end = end if line_end < 0 else line_end + 1
+            line = buffer[position:line_end]
+
+            depth = scanner.depth
+            key = scanner.feed(line)
+            if key is _Scanner.document_end:
+                yield from self._iterations(iterations)
+                yield from self._complete(buffer, position)
+                scanner = state['scanner'] = _Scanner()
+                state.update(
+                    document_start=position, n_documents=state['n_documents'] + 1, key=None,
+                    item_start=None, n_iterations=0, path=[], item_indices=None, scf_rows=[])
+                scanner.feed(line)
+
+            elif key is not None:
+                state.update(key=key.lower(), path=[])
+                if state['key'] in step_keys and not state['header']:
+                    yield self._header(buffer, position)
+
+            elif state['key'] == scf_path[0]:
+                # the iterations are flow mappings in block collections, each is loaded
+                # on its own once it is closed and its loop indices are given by the
+                # keys and list indices to it
+                if depth == 0:
+                    flow = self._track(line)
+                    if flow is not None:
+                        state.update(item_start=position + flow, item_indices=_scf_indices(
+                            [key for _, key in state['path']]))
+                if state['item_start'] is not None and scanner.depth == 0:
+                    iteration = self._load_iteration(buffer[state['item_start']:line_end])
+                    if iteration is not None and state['item_indices'] is not None:
+                        iterations.append((state['item_indices'], iteration))
+                    state.update(item_start=None, item_indices=None)
+
+            position = line_end
+
+        state['position'] = position
+        yield from self._iterations(iterations)
+        if final and position > state['document_start']:
+            yield from self._complete(buffer, position)
+            state.update(
+                document_start=position, key=None, item_start=None, n_iterations=0, path=[],
+                item_indices=None, scf_rows=[])
+
+    def _track(self, line):
+        # follows the path of block mapping keys and list indices within the scf
+        # section, returns the offset in line of a flow mapping item
+        path = self.state['path']
+        match = re_item.match(line)
+        if match is not None:
+            column = len(match.group(1))
+            siblings = [key for indent, key in path if indent == column and isinstance(key, int)]
+            path[:] = [
+                (indent, key) for indent, key in path
+                if indent < column or (indent == column and not isinstance(key, int))]
+            path.append((column, siblings[-1] + 1 if siblings else 0))
+            if line[match.end():match.end() + 1] == b'{':
+                return match.end()
+            start = match.end()
+        else:
+            start = 0
+
+        match = re_key.match(line, start)
+        if match is not None:
+            column = start + len(match.group(1))
+            path[:] = [(indent, key) for indent, key in path if indent < column]
+            path.append((column, match.group(2).strip(b'"\'').decode('utf-8', 'replace').lower()))
+        return None
+
+    def _header(self, buffer, end):
+        self.state['header'] = True
+        try:
+            document = LazyDocument(buffer, self.state['document_start'], end)
+            return self.parser._extract_header(self._context, document)
+        except yaml.YAMLError as e:
+            return dict(error=str(e))
+
+    def _load_iteration(self, data):
+        try:
+            iteration = yaml.load(data, Loader=Loader)
+        except yaml.YAMLError:
+            return None
+        return iteration if isinstance(iteration, dict) else None
+
+    def _iterations(self, iterations):
+        if not iterations:
+            return
+
+        yield dict(
+            step=self.state['n_steps'], first_iteration=self.state['n_iterations'],
+            number_of_scf_iterations=len(iterations),
+            scf=extract_scf([iteration for _, iteration in iterations]))
+        self.state['n_iterations'] += len(iterations)
+        self.state['scf_rows'].extend(scf_row(indices, iteration) for indices, iteration in iterations)
+        iterations.clear()
+
+    def _complete(self, buffer, end):
+        document = LazyDocument(buffer, self.state['document_start'], end)
+        if self.state['n_documents'] > 0 and not is_step(document):
+            return
+
+        # the scf iterations were collected while the log was read, the section is
+        # marked as loaded so that only the other sections are loaded
+        scf_keys = [key for key in document if key.lower() == scf_path[0]]
+        for key in scf_keys:
+            document[key] = None
+
+        try:
+            if not self.state['header']:
+                self.state['header'] = True
+                yield self.parser._extract_header(self._context, document)
+            step = extract_step(document, self.parser.step_plan, self.state['carried'])
+        except yaml.YAMLError as e:
+            yield dict(error=str(e))
+            return
+
+        if scf_keys:
+            step['scc'].update(collect_scf(
+                self.parser.scf_history or ScfHistory(), self.state['scf_rows']))
+            if self.state['item_start'] is not None:
+                # the log ends within an iteration
+                step['truncation'] = dict(section=scf_keys[-1], position=self.state['item_start'])
+        self.state['n_steps'] += 1
+        yield step
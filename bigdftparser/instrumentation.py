@@ -0,0 +1,180 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD.
+# See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import time
+import logging
+import resource
+import cProfile
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+def current_rss():
+    '''
+    Returns the current resident memory of the process in bytes or None if it is not
+    available, i.e. not on linux.
+    '''
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Instrumentation:
+    '''
+    Accumulates wall time, bytes read and, with memory, the largest increase of the
+    resident memory of named parser phases. Time and memory of a nested phase are only
+    accounted to the inner phase. The resident memory is only sampled at the phase
+    boundaries, no process state is changed, and as it is process wide it is only
+    exact without concurrent parses. The exact peak allocation of a phase is given by
+    profiling it with tracemalloc. The phases in profile can be run under cProfile or
+    tracemalloc and their results dumped to profile_directory for offline analysis.
+    '''
+    def __init__(self, profile=None, profiler='cprofile', profile_directory='.', memory=True):
+        if profiler not in ['cprofile', 'tracemalloc']:
+            raise ValueError('Unknown profiler %s.' % profiler)
+
+        self.profile = set(profile or [])
+        self.profiler = profiler
+        self.profile_directory = profile_directory
+        self.memory = memory
+        self.reset()
+
+    def reset(self):
+        self.phases = OrderedDict()
+        self._stack = []
+        self._profiles = dict()
+        self._profiling = None
+        self._tracing = False
+
+    def _get(self, name):
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = dict(time=0., bytes=0, rss_increase=0, count=0)
+        return phase
+
+    def add(self, name, elapsed, size=0):
+        '''
+        Accounts time and bytes that were measured outside of a phase context, e.g. in
+        a generator.
+        '''
+        phase = self._get(name)
+        phase['time'] += elapsed
+        phase['bytes'] += size
+        phase['count'] += 1
+
+    @contextmanager
+    def phase(self, name, size=0):
+        phase = self._get(name)
+
+        profiling = name in self.profile and self._profiling is None
+        if profiling:
+            self._start_profile(name)
+
+        # memory that is still held by nested phases is not accounted to this phase,
+        # offset is the start memory plus the growth of the completed nested phases
+        rss = current_rss() if self.memory else None
+        if self._stack:
+            self._sample(self._stack[-1], rss)
+        frame = dict(nested=0., start_rss=rss, offset=rss, increase=0)
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            rss = current_rss() if self.memory else None
+            self._sample(frame, rss)
+            self._stack.pop()
+            if self._stack:
+                outer = self._stack[-1]
+                outer['nested'] += elapsed
+                if rss is not None and outer['offset'] is not None:
+                    outer['offset'] += rss - frame['start_rss']
+            phase['time'] += elapsed - frame['nested']
+            phase['bytes'] += size
+            phase['rss_increase'] = max(phase['rss_increase'], frame['increase'])
+            phase['count'] += 1
+
+            if profiling:
+                self._stop_profile(name, phase)
+
+    def _sample(self, frame, rss):
+        if rss is not None and frame['offset'] is not None:
+            frame['increase'] = max(frame['increase'], rss - frame['offset'])
+
+    def _start_profile(self, name):
+        self._profiling = name
+        if self.profiler == 'cprofile':
+            self._profiles.setdefault(name, cProfile.Profile()).enable()
+        else:
+            self._tracing = not tracemalloc.is_tracing()
+            if self._tracing:
+                tracemalloc.start()
+            tracemalloc.clear_traces()
+
+    def _stop_profile(self, name, phase):
+        self._profiling = None
+        if self.profiler == 'cprofile':
+            self._profiles[name].disable()
+        else:
+            # the snapshot holds the allocations of the last run of the phase
+            phase['peak_allocation'] = max(
+                phase.get('peak_allocation', 0), tracemalloc.get_traced_memory()[1])
+            self._profiles[name] = tracemalloc.take_snapshot()
+            if self._tracing:
+                tracemalloc.stop()
+
+    def fields(self):
+        '''
+        Returns the accumulated values as flat structured logging fields.
+        '''
+        fields = OrderedDict()
+        for name, phase in self.phases.items():
+            for key, value in phase.items():
+                fields['%s_%s' % (name, key)] = value
+        fields['total_time'] = sum(phase['time'] for phase in self.phases.values())
+        return fields
+
+    def log(self, logger, event='parser phases'):
+        fields = self.fields()
+        if isinstance(logger, (logging.Logger, logging.LoggerAdapter)) or logger is logging:
+            logger.info(event, extra=fields)
+        else:
+            # structlog style loggers as used by nomad
+            logger.info(event, **fields)
+
+    def dump(self, prefix):
+        '''
+        Writes the profiles of all profiled phases to profile_directory and returns
+        their paths.
+        '''
+        paths = []
+        for name, profile in self._profiles.items():
+            path = os.path.join(self.profile_directory, '%s.%s.%s' % (
+                prefix, name, 'prof' if self.profiler == 'cprofile' else 'tracemalloc'))
+            if self.profiler == 'cprofile':
+                profile.dump_stats(path)
+            else:
+                profile.dump(path)
+            paths.append(path)
+        return paths
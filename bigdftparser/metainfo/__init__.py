@@ -16,14 +16,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-import sys
-from nomad.metainfo import Environment
-from nomad.metainfo.legacy import LegacyMetainfoEnvironment
-import nomad.datamodel.metainfo.common
-import nomad.datamodel.metainfo.public
-import nomad.datamodel.metainfo.general
 
-m_env = LegacyMetainfoEnvironment()
-m_env.m_add_sub_section(Environment.packages, sys.modules['nomad.datamodel.metainfo.common'].m_package)  # type: ignore
-m_env.m_add_sub_section(Environment.packages, sys.modules['nomad.datamodel.metainfo.public'].m_package)  # type: ignore
-m_env.m_add_sub_section(Environment.packages, sys.modules['nomad.datamodel.metainfo.general'].m_package)  # type: ignore
+import importlib
+
+
+def _create_environment():
+    from nomad.metainfo import Environment
+    from nomad.metainfo.legacy import LegacyMetainfoEnvironment
+
+    m_env = LegacyMetainfoEnvironment()
+    for name in [
+            'bigdftparser.metainfo.bigdft', 'nomad.datamodel.metainfo.common',
+            'nomad.datamodel.metainfo.public', 'nomad.datamodel.metainfo.general']:
+        m_env.m_add_sub_section(Environment.packages, importlib.import_module(name).m_package)
+    return m_env
+
+
+def __getattr__(name):
+    # the environment is only built when it is used
+    if name == 'm_env':
+        global m_env
+        m_env = _create_environment()
+        return m_env
+    raise AttributeError('module %s has no attribute %s' % (__name__, name))
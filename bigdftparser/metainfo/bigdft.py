@@ -0,0 +1,299 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD.
+# See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import numpy as np            # pylint: disable=unused-import
+from nomad.metainfo import (  # pylint: disable=unused-import
+    MSection, Package, Quantity, Section, SubSection, SectionProxy
+)
+from nomad.metainfo.legacy import LegacyDefinition
+
+from nomad.datamodel.metainfo import common_dft
+
+m_package = Package(
+    name='bigdft_nomadmetainfo_json',
+    description='None',
+    a_legacy=LegacyDefinition(name='bigdft.nomadmetainfo.json'))
+
+
+class x_bigdft_section_resources(MSection):
+    '''
+    The parallelization, grid sizes and memory estimates reported by BigDFT.
+    '''
+
+    m_def = Section(validate=False, a_legacy=LegacyDefinition(name='x_bigdft_section_resources'))
+
+    x_bigdft_mpi_tasks = Quantity(
+        type=np.dtype(np.int32),
+        shape=[],
+        description='''
+        Number of MPI tasks.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_mpi_tasks'))
+
+    x_bigdft_openmp_threads = Quantity(
+        type=np.dtype(np.int32),
+        shape=[],
+        description='''
+        Maximal number of OpenMP threads per MPI task.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_openmp_threads'))
+
+    x_bigdft_grid_spacings = Quantity(
+        type=np.dtype(np.float64),
+        shape=[3],
+        unit='meter',
+        description='''
+        Grid spacings of the simulation box in the three directions.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_grid_spacings'))
+
+    x_bigdft_grid_points = Quantity(
+        type=np.dtype(np.int32),
+        shape=[3],
+        description='''
+        Size of the simulation domain in grid spacing units.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_grid_points'))
+
+    x_bigdft_coarse_grid_points = Quantity(
+        type=np.dtype(np.int64),
+        shape=[],
+        description='''
+        Number of points of the coarse resolution wavefunction grid.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_coarse_grid_points'))
+
+    x_bigdft_coarse_grid_segments = Quantity(
+        type=np.dtype(np.int64),
+        shape=[],
+        description='''
+        Number of segments of the coarse resolution wavefunction grid.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_coarse_grid_segments'))
+
+    x_bigdft_fine_grid_points = Quantity(
+        type=np.dtype(np.int64),
+        shape=[],
+        description='''
+        Number of points of the fine resolution wavefunction grid.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_fine_grid_points'))
+
+    x_bigdft_fine_grid_segments = Quantity(
+        type=np.dtype(np.int64),
+        shape=[],
+        description='''
+        Number of segments of the fine resolution wavefunction grid.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_fine_grid_segments'))
+
+    x_bigdft_kernel_mpi_tasks = Quantity(
+        type=np.dtype(np.int32),
+        shape=[],
+        description='''
+        Number of MPI tasks of the Poisson kernel.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_kernel_mpi_tasks'))
+
+    x_bigdft_kernel_openmp_threads = Quantity(
+        type=np.dtype(np.int32),
+        shape=[],
+        description='''
+        Number of OpenMP threads per MPI task of the Poisson kernel.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_kernel_openmp_threads'))
+
+    x_bigdft_kernel_memory = Quantity(
+        type=np.dtype(np.float64),
+        shape=[],
+        unit='byte',
+        description='''
+        Memory of the Poisson kernel per MPI task.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_kernel_memory'))
+
+    x_bigdft_density_memory = Quantity(
+        type=np.dtype(np.float64),
+        shape=[],
+        unit='byte',
+        description='''
+        Memory of the density per MPI task.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_density_memory'))
+
+    x_bigdft_full_grid_memory = Quantity(
+        type=np.dtype(np.float64),
+        shape=[],
+        unit='byte',
+        description='''
+        Memory of the full grid arrays per MPI task.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_full_grid_memory'))
+
+    x_bigdft_wavefunctions_memory = Quantity(
+        type=np.dtype(np.float64),
+        shape=[],
+        unit='byte',
+        description='''
+        Memory occupied by the wavefunctions of the root MPI process.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_wavefunctions_memory'))
+
+    x_bigdft_estimated_memory_peak = Quantity(
+        type=np.dtype(np.float64),
+        shape=[],
+        unit='byte',
+        description='''
+        Estimated memory peak per MPI task.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_estimated_memory_peak'))
+
+
+class x_bigdft_section_timing(MSection):
+    '''
+    The timings of the categories of one counter, e.g. INIT, WFN_OPT or LAST, read
+    from the time.yaml file of the run.
+    '''
+
+    m_def = Section(validate=False, a_legacy=LegacyDefinition(name='x_bigdft_section_timing'))
+
+    x_bigdft_timing_counter = Quantity(
+        type=str,
+        shape=[],
+        description='''
+        Name of the timing counter.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_timing_counter'))
+
+    x_bigdft_timing_total_time = Quantity(
+        type=np.dtype(np.float64),
+        shape=[],
+        unit='second',
+        description='''
+        Total time of the counter.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_timing_total_time'))
+
+    x_bigdft_timing_categories = Quantity(
+        type=str,
+        shape=['*'],
+        description='''
+        Names of the timing categories, ordered by time consumption.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_timing_categories'))
+
+    x_bigdft_timing_classes = Quantity(
+        type=str,
+        shape=['*'],
+        description='''
+        Classes of the timing categories, e.g. Communications or Convolutions.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_timing_classes'))
+
+    x_bigdft_timing_percents = Quantity(
+        type=np.dtype(np.float64),
+        shape=['*'],
+        description='''
+        Percentage of the total time of each category.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_timing_percents'))
+
+    x_bigdft_timing_times = Quantity(
+        type=np.dtype(np.float64),
+        shape=['*'],
+        unit='second',
+        description='''
+        Time of each category, averaged over the MPI tasks.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_timing_times'))
+
+    x_bigdft_timing_max_times = Quantity(
+        type=np.dtype(np.float64),
+        shape=['*'],
+        unit='second',
+        description='''
+        Maximal time of each category over the MPI tasks.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_timing_max_times'))
+
+    x_bigdft_timing_min_times = Quantity(
+        type=np.dtype(np.float64),
+        shape=['*'],
+        unit='second',
+        description='''
+        Minimal time of each category over the MPI tasks.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_timing_min_times'))
+
+
+class section_scf_iteration(common_dft.section_scf_iteration):
+
+    m_def = Section(validate=False, extends_base_section=True, a_legacy=LegacyDefinition(name='section_scf_iteration'))
+
+    x_bigdft_scf_ground_state_loop = Quantity(
+        type=np.dtype(np.int32),
+        shape=[],
+        description='''
+        Index of the ground state optimization loop of the iteration, e.g. of a restart or
+        of an outer loop of a linear scaling run.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_scf_ground_state_loop'))
+
+    x_bigdft_scf_loop_kind = Quantity(
+        type=str,
+        shape=[],
+        description='''
+        Kind of the loop of the iteration: wavefunctions, or support_functions or kernel
+        for linear scaling runs.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_scf_loop_kind'))
+
+    x_bigdft_scf_hamiltonian_loop = Quantity(
+        type=np.dtype(np.int32),
+        shape=[],
+        description='''
+        Index of the hamiltonian optimization loop of a wavefunctions iteration within
+        its ground state optimization loop.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_scf_hamiltonian_loop'))
+
+    x_bigdft_scf_iteration_index = Quantity(
+        type=np.dtype(np.int32),
+        shape=[],
+        description='''
+        Index of the iteration within its loop.
+        ''',
+        a_legacy=LegacyDefinition(name='x_bigdft_scf_iteration_index'))
+
+
+class section_run(common_dft.section_run):
+
+    m_def = Section(validate=False, extends_base_section=True, a_legacy=LegacyDefinition(name='section_run'))
+
+    x_bigdft_section_resources = SubSection(
+        sub_section=SectionProxy('x_bigdft_section_resources'),
+        repeats=False,
+        a_legacy=LegacyDefinition(name='x_bigdft_section_resources'))
+
+    x_bigdft_section_timing = SubSection(
+        sub_section=SectionProxy('x_bigdft_section_timing'),
+        repeats=True,
+        a_legacy=LegacyDefinition(name='x_bigdft_section_timing'))
+
+
+m_package.__init_metainfo__()
@@ -0,0 +1,102 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD.
+# See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import functools
+import numpy as np
+import msgpack
+
+
+# the msgpack extension type of numpy arrays: [dtype, shape, raw buffer]
+ndarray_code = 1
+
+
+def _is_array(definition):
+    return isinstance(definition.type, np.dtype) and len(definition.shape) > 0 and \
+        not definition.virtual
+
+
+@functools.lru_cache(maxsize=None)
+def _definitions(section_def):
+    # the array quantities and a filter for the other quantities of a section definition
+    arrays = [quantity for quantity in section_def.all_quantities.values() if _is_array(quantity)]
+    values = set(section_def.all_quantities.values()) - set(arrays)
+    return arrays, lambda definition, section: definition in values
+
+
+def _pack_array(packer, value):
+    value = np.ascontiguousarray(getattr(value, 'magnitude', value))
+    return packer.pack(msgpack.ExtType(ndarray_code, msgpack.packb(
+        [value.dtype.str, list(value.shape), value.tobytes()], use_bin_type=True)))
+
+
+def _write_section(section, packer, f):
+    # the other quantities are serialized by the metainfo as for JSON, the sub
+    # sections are written one at a time
+    arrays, is_value = _definitions(section.m_def)
+    values = section.m_to_dict(partial=is_value)
+    arrays = [quantity for quantity in arrays if section.m_is_set(quantity)]
+    sub_sections = [
+        sub_section_def for sub_section_def in section.m_def.all_sub_sections.values()
+        if section.m_sub_section_count(sub_section_def) > 0]
+
+    f.write(packer.pack_map_header(len(values) + len(arrays) + len(sub_sections)))
+    for key, value in values.items():
+        f.write(packer.pack(key))
+        f.write(packer.pack(value))
+
+    for quantity in arrays:
+        f.write(packer.pack(quantity.name))
+        f.write(_pack_array(packer, section.m_get(quantity)))
+
+    for sub_section_def in sub_sections:
+        f.write(packer.pack(sub_section_def.name))
+        items = section.m_get_sub_sections(sub_section_def)
+        if sub_section_def.repeats:
+            f.write(packer.pack_array_header(len(items)))
+        else:
+            items = items[-1:]
+        for item in items:
+            if item is None:
+                f.write(packer.pack(None))
+            else:
+                _write_section(item, packer, f)
+
+
+def write_msgpack(archive, f):
+    '''
+    Writes the archive to the binary file object f as msgpack with the numpy arrays,
+    e.g. positions, forces and eigenvalues, as raw typed buffers. The sections are
+    streamed to f, the archive is never converted to a dict as a whole.
+    '''
+    _write_section(archive, msgpack.Packer(use_bin_type=True), f)
+
+
+def _ext_hook(code, data):
+    if code != ndarray_code:
+        return msgpack.ExtType(code, data)
+    dtype, shape, buffer = msgpack.unpackb(data, raw=False)
+    return np.frombuffer(buffer, dtype=np.dtype(dtype)).reshape(shape)
+
+
+def read_msgpack(f):
+    '''
+    Reads an archive written by write_msgpack as a dict like EntryArchive.m_to_dict
+    but with numpy arrays.
+    '''
+    return msgpack.unpack(f, raw=False, ext_hook=_ext_hook, strict_map_key=False)
@@ -0,0 +1,159 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD.
+# See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import functools
+
+
+class Rule:
+    '''
+    Declares a value of the extracted records. It is read from the first of the given
+    YAML paths (tuples of case-insensitive keys and list indices) that is present and
+    converted with convert. Values without paths are derived in code. If target is
+    given, the value is written to this metainfo quantity with the given unit.
+
+    The optional raw function reads the value directly from the unparsed top-level
+    section of a lazily loaded document. It returns the value and the loaded rest of
+    the section or None to load the whole section.
+    '''
+    def __init__(
+            self, key, paths=(), convert=None, default=None, target=None, unit=None,
+            raw=None):
+        self.key = key
+        self.paths = paths
+        self.convert = convert
+        self.default = default
+        self.target = target
+        self.unit = unit
+        self.raw = raw
+
+
+class _Node:
+    def __init__(self):
+        self.rules = []
+        self.raw_rules = []
+        self.children = dict()
+
+
+class Plan:
+    '''
+    The rules compiled into a tree of lower case path keys. Extraction visits every
+    present key of the document at most once and only loads the sections on a path.
+    '''
+    def __init__(self, rules):
+        self.rules = rules
+        self._index = dict()
+        self.sections = set(path[0].lower() for rule in rules for path in rule.paths)
+        for rule in rules:
+            for priority, path in enumerate(rule.paths):
+                index = self._index
+                for key in path:
+                    node = index.setdefault(key.lower() if isinstance(key, str) else key, _Node())
+                    index = node.children
+                node.rules.append((priority, rule))
+                if rule.raw is not None:
+                    self._index[path[0].lower()].raw_rules.append((priority, rule))
+
+    def extract(self, source, release=False):
+        '''
+        Returns the values of all rules with paths in source, using their defaults
+        if not present. With release, the visited top-level sections are removed from
+        source to free their memory.
+        '''
+        found = dict()
+        self._visit(source, self._index, found, release)
+
+        values = dict()
+        for rule in self.rules:
+            if not rule.paths:
+                continue
+            value = found.get(rule.key)
+            if value is None:
+                values[rule.key] = rule.default
+            elif rule.convert is not None and not value[1]:
+                values[rule.key] = rule.convert(value[2])
+            else:
+                values[rule.key] = value[2]
+        return values
+
+    def keys(self):
+        '''
+        Returns the nested dict of the lower case mapping keys on the paths, with None
+        for the keys whose whole value is read.
+        '''
+        return _keys(self._index)
+
+    def _visit(self, source, index, found, release=False):
+        if isinstance(source, list):
+            items = [(key, key) for key in index if isinstance(key, int) and key < len(source)]
+        elif hasattr(source, 'keys'):
+            items = [
+                (key, key.lower()) for key in list(source.keys())
+                if isinstance(key, str) and key.lower() in index]
+        else:
+            return
+
+        for key, index_key in items:
+            node = index[index_key]
+            for priority, rule in node.raw_rules:
+                raw = source.raw(key) if hasattr(source, 'raw') else None
+                result = rule.raw(raw) if raw is not None else None
+                if result is not None:
+                    self._found(found, priority, rule, result[0], True)
+                    source[key] = result[1]
+
+            value = source.pop(key) if release else source[key]
+            if value is None:
+                continue
+            for priority, rule in node.rules:
+                self._found(found, priority, rule, value, False)
+            if node.children:
+                self._visit(value, node.children, found)
+
+    def _found(self, found, priority, rule, value, converted):
+        current = found.get(rule.key)
+        if current is None or priority < current[0]:
+            found[rule.key] = (priority, converted, value)
+
+
+def _keys(index):
+    return {
+        key: _keys(node.children) if node.children and not node.rules else None
+        for key, node in index.items() if isinstance(key, str)}
+
+
+@functools.lru_cache(maxsize=None)
+def unit(name):
+    '''
+    Returns the pint unit with the given name, units are only parsed once.
+    '''
+    from nomad.units import ureg
+    return ureg.parse_units(name)
+
+
+def populate(section, rules, values):
+    '''
+    Writes the values of the rules with targets to the given section.
+    '''
+    for rule in rules:
+        value = values.get(rule.key)
+        if rule.target is None or value is None:
+            continue
+        if rule.unit is not None:
+            value = value * unit(rule.unit)
+        section.m_set(section.m_def.all_quantities[rule.target], value)
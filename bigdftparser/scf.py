@@ -0,0 +1,121 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD.
+# See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import numpy as np
+
+
+class ScfHistory:
+    '''
+    The policy for the SCF iterations that are kept of very long histories: all of
+    them, only the last ones or at most samples iterations evenly spread over the
+    history plus the final iteration. The iterations are streamed into fixed size
+    float64 arrays, their memory does not grow with the length of the history except
+    when all are kept.
+    '''
+    def __init__(self, last=None, samples=None):
+        if last is not None and samples is not None:
+            raise ValueError('Only one of last and samples can be given.')
+        if last is not None and last < 1:
+            raise ValueError('last must be positive.')
+        if samples is not None and samples < 2:
+            raise ValueError('samples must be at least 2.')
+        self.last = last
+        self.samples = samples
+
+    @classmethod
+    def from_string(cls, spec):
+        '''
+        Creates the policy from all, last=N or samples=N.
+        '''
+        name, _, value = spec.partition('=')
+        if name == 'all' and not value:
+            return cls()
+        if name in ['last', 'samples'] and value.isdigit():
+            return cls(**{name: int(value)})
+        raise ValueError('Unknown scf history %s.' % spec)
+
+    def __repr__(self):
+        if self.last is not None:
+            return 'last=%d' % self.last
+        if self.samples is not None:
+            return 'samples=%d' % self.samples
+        return 'all'
+
+    def collect(self, iterations, keys):
+        '''
+        Collects the values of keys from the iterable of iteration dicts. Returns
+        dict(number_of_scf_iterations, scf, scf_indices) with the total number of
+        iterations, the columns of the kept iterations without the keys that are never
+        given and the indices of the kept iterations.
+        '''
+        capacity = self.last or (self.samples + 1 if self.samples else 64)
+        values = np.full((capacity, len(keys)), np.nan)
+        indices = np.zeros(capacity, dtype=np.int64)
+        n_kept, stride, n_iteration, final = 0, 1, -1, None
+
+        for n_iteration, iteration in enumerate(iterations):
+            row = [iteration.get(key) for key in keys]
+            row = [np.nan if val is None else val for val in row]
+
+            if self.last is not None:
+                # a ring buffer, put in order below
+                values[n_iteration % capacity] = row
+                n_kept = min(n_iteration + 1, capacity)
+                continue
+
+            if self.samples is not None:
+                final = row
+                if n_iteration % stride:
+                    continue
+                if n_kept == self.samples:
+                    # every other kept iteration is dropped and the stride doubled
+                    keep = indices[:n_kept] % (2 * stride) == 0
+                    n_kept = int(np.count_nonzero(keep))
+                    values[:n_kept] = values[:len(keep)][keep]
+                    indices[:n_kept] = indices[:len(keep)][keep]
+                    stride *= 2
+                    if n_iteration % stride:
+                        continue
+
+            elif n_kept == capacity:
+                capacity *= 2
+                values = np.concatenate([values, np.full(values.shape, np.nan)])
+                indices = np.concatenate([indices, np.zeros_like(indices)])
+
+            values[n_kept] = row
+            indices[n_kept] = n_iteration
+            n_kept += 1
+
+        n_iterations = n_iteration + 1
+        if self.last is not None:
+            values = np.roll(values[:n_kept], -(n_iterations % n_kept) if n_kept else 0, axis=0)
+            indices = np.arange(n_iterations - n_kept, n_iterations)
+        elif final is not None and indices[n_kept - 1] != n_iterations - 1:
+            values[n_kept] = final
+            indices[n_kept] = n_iterations - 1
+            n_kept += 1
+
+        scf = dict()
+        for n_key, key in enumerate(keys):
+            column = np.array(values[:n_kept, n_key])
+            if not np.all(np.isnan(column)):
+                scf[key] = column
+
+        return dict(
+            number_of_scf_iterations=n_iterations, scf=scf, scf_indices=np.array(indices[:n_kept]))
@@ -0,0 +1,704 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD.
+# See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import re
+import time
+import gzip
+import bz2
+import lzma
+import contextvars
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+import numpy as np
+import yaml
+try:
+    from yaml import CLoader as Loader
+except ImportError:
+    from yaml import Loader  # type: ignore
+
+
+re_key = re.compile(rb'( *)([^\s#\-][^\n]*?)\s*:(?:\s|$)')
+re_quoted = re.compile(rb'(?<![^\s\[{,:])(?:"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\n]|\'\')*\')')
+re_comment = re.compile(rb'(?:^|\s)#.*')
+re_atom = re.compile(
+    rb'^[ \t]*-[ \t]+\{?[ \t]*([A-Za-z]\w*)[ \t]*:[ \t]*\[([^\]\n]*)\][ \t]*\}?[ \t]*(?:#[^\n]*)?(?:\n|$)',
+    re.M)
+re_item = re.compile(rb'^[ \t]*-[ \t]', re.M)
+
+
+def _flow_depth(line, depth):
+    '''
+    Returns the flow collection depth after the given line, ignoring brackets in
+    quoted scalars and comments.
+    '''
+    if b'"' in line or b"'" in line:
+        line = re_quoted.sub(b'', line)
+    if b'#' in line:
+        line = re_comment.sub(b'', line)
+    return depth + line.count(b'{') + line.count(b'[') - line.count(b'}') - line.count(b']')
+
+
+@contextmanager
+def _no_phase(name, size=0):
+    yield
+
+
+# the function called while sections are read and their items are built
+_check = contextvars.ContextVar('check', default=None)
+
+
+@contextmanager
+def checking(check):
+    '''
+    Calls check while the sections of documents are read and their items are built in
+    this context, e.g. to give up a parse that exceeds its budget by raising.
+    '''
+    token = _check.set(check)
+    try:
+        yield
+    finally:
+        _check.reset(token)
+
+
+def check_progress():
+    '''
+    Calls the check of the current checking context, if any.
+    '''
+    check = _check.get()
+    if check is not None:
+        check()
+
+
+class _Scanner:
+    '''
+    Finds the top-level section keys and the end of the document in a sequence of lines.
+    '''
+    document_end = object()
+
+    def __init__(self):
+        self.indent = None
+        self.depth = 0
+        self.started = False
+        self.has_keys = False
+
+    def feed(self, line):
+        '''
+        Returns the key if line starts a top-level section, document_end if line
+        starts the next document and None otherwise.
+        '''
+        key = None
+        if self.depth == 0:
+            if line.startswith(b'---') or line.startswith(b'...'):
+                if self.started or self.has_keys:
+                    return _Scanner.document_end
+                self.started = True
+                return None
+
+            match = re_key.match(line)
+            if match and (self.indent is None or len(match.group(1)) == self.indent):
+                self.indent = len(match.group(1))
+                self.has_keys = True
+                key = match.group(2).strip(b'"\'').decode('utf-8', 'replace')
+
+        if self.depth or b'{' in line or b'[' in line:
+            self.depth = max(0, _flow_depth(line, self.depth))
+        return key
+
+
+def index_sections(buffer, start=0, end=None):
+    '''
+    Scans a single YAML document in buffer[start:end] line by line and returns the
+    byte ranges of its top-level sections as an ordered key -> (start, end) dict
+    together with the position where the document ends and whether it ends complete,
+    i.e. not within a line or an open flow collection. Nothing is parsed.
+    '''
+    end = len(buffer) if end is None else end
+    sections = OrderedDict()
+    scanner = _Scanner()
+    key, key_start = None, None
+    position = start
+
+    while position < end:
+        line_end = buffer.find(b'\n', position, end)
+        line_end = end if line_end < 0 else line_end + 1
+
+        new_key = scanner.feed(buffer[position:line_end])
+        if new_key is _Scanner.document_end:
+            break
+        if new_key is not None:
+            if key is not None:
+                sections[key] = (key_start, position)
+            key, key_start = new_key, position
+        position = line_end
+
+    if key is not None:
+        sections[key] = (key_start, position)
+
+    complete = scanner.depth == 0 and (position == start or buffer[position - 1:position] == b'\n')
+    return sections, position, complete
+
+
+class RangeReader:
+    '''
+    A binary file object over buffer[start:end], e.g. a section of a memory-mapped log.
+    The YAML parser reads it in chunks, the range is never copied as a whole.
+    '''
+    def __init__(self, buffer, start=0, end=None):
+        self.buffer = buffer
+        self.start = start
+        self.end = len(buffer) if end is None else end
+        self.position = start
+
+    def read(self, size=-1):
+        check_progress()
+        end = self.end if size is None or size < 0 else min(self.end, self.position + size)
+        data = self.buffer[self.position:end]
+        self.position = end
+        return data
+
+
+def _line_end(buffer, start, end):
+    # the end of the last complete line in buffer[start:end]
+    if end > start and buffer[end - 1:end] == b'\n':
+        return end
+    return max(start, buffer.rfind(b'\n', start, end) + 1)
+
+
+def _content_end(buffer, start, end):
+    # the end of buffer[start:end] without trailing whitespace
+    while end > start and buffer[end - 1:end].isspace():
+        end -= 1
+    return end
+
+
+def load_section(data):
+    '''
+    Loads the value of the single top-level section in data, bytes or a reader.
+    '''
+    data = yaml.load(data, Loader=Loader)
+    return list(data.values())[-1] if isinstance(data, dict) and data else None
+
+
+_resolver = yaml.resolver.Resolver()
+_constructor = yaml.constructor.SafeConstructor()
+
+
+def _construct_scalar(event):
+    tag = event.tag
+    if tag is None or tag == '!':
+        tag = _resolver.resolve(yaml.ScalarNode, event.value, event.implicit)
+    construct = _constructor.yaml_constructors.get(
+        tag, yaml.constructor.SafeConstructor.construct_undefined)
+    return construct(_constructor, yaml.ScalarNode(tag, event.value, style=event.style))
+
+
+def _mark_position(buffer, mark, start=0):
+    position = start
+    for _ in range(mark.line):
+        position = buffer.find(b'\n', position) + 1
+    # columns count characters, BigDFT logs are ascii
+    return position + mark.column
+
+
+class _Collection:
+    def __init__(self, event):
+        self.value = dict() if isinstance(event, yaml.MappingStartEvent) else list()
+        self.flow = event.flow_style
+        self.mark = event.start_mark
+        self.key = _Collection
+
+    def add(self, value):
+        if isinstance(self.value, list):
+            self.value.append(value)
+        elif self.key is _Collection:
+            self.key = value
+        else:
+            self.value[self.key] = value
+            self.key = _Collection
+
+
+def load_partial(buffer, start=0, end=None):
+    '''
+    Loads the well-formed part of the YAML document in buffer[start:end] that may be
+    truncated, e.g. the end of the log of a killed job, in a single pass over the parser
+    events. Incomplete lines and flow collections, e.g. single SCF iterations, are
+    dropped, incomplete block collections keep their complete entries. Returns the
+    loaded document and the position relative to start where the well-formed part
+    ends or None if nothing was dropped.
+    '''
+    end = len(buffer) if end is None else end
+    position = None
+    if end == start or buffer[end - 1:end] != b'\n':
+        end = _line_end(buffer, start, end)
+        position = end - start
+
+    root = None
+    stack = []
+    anchors = dict()
+    try:
+        for event in yaml.parse(RangeReader(buffer, start, end), Loader=Loader):
+            if isinstance(event, (yaml.ScalarEvent, yaml.AliasEvent)):
+                if isinstance(event, yaml.AliasEvent):
+                    value = anchors.get(event.anchor)
+                else:
+                    value = _construct_scalar(event)
+                    if event.anchor is not None:
+                        anchors[event.anchor] = value
+            elif isinstance(event, (yaml.MappingStartEvent, yaml.SequenceStartEvent)):
+                stack.append(_Collection(event))
+                if event.anchor is not None:
+                    anchors[event.anchor] = stack[-1].value
+                continue
+            elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+                value = stack.pop().value
+            elif isinstance(event, yaml.DocumentEndEvent):
+                break
+            else:
+                continue
+
+            if stack:
+                stack[-1].add(value)
+            else:
+                root = value
+
+    except yaml.YAMLError as e:
+        mark = getattr(e, 'problem_mark', None)
+        if mark is not None:
+            error_position = _mark_position(buffer, mark, start) - start
+            position = error_position if position is None else min(position, error_position)
+
+        # everything from the outermost open flow collection on is incomplete
+        for n_collection, collection in enumerate(stack):
+            if collection.flow:
+                position = _mark_position(buffer, collection.mark, start) - start
+                del stack[n_collection:]
+                break
+
+        while stack:
+            value = stack.pop().value
+            if not stack:
+                root = value
+            elif stack[-1].key is not _Collection or isinstance(stack[-1].value, list):
+                stack[-1].add(value)
+
+    return root, position
+
+
+_start_events = (yaml.MappingStartEvent, yaml.SequenceStartEvent)
+_end_events = (yaml.MappingEndEvent, yaml.SequenceEndEvent)
+
+
+def _skip(events, event):
+    # consumes the events of the node that starts with event
+    depth = 0
+    while True:
+        if isinstance(event, _start_events):
+            depth += 1
+        elif isinstance(event, _end_events):
+            depth -= 1
+        if depth == 0:
+            return
+        event = next(events)
+
+
+def _build(events, event, keys, anchors):
+    # builds the node that starts with event, of its mappings only the keys in the
+    # nested keys dict are built
+    if isinstance(event, yaml.AliasEvent):
+        return anchors.get(event.anchor)
+
+    anchor = event.anchor
+    if isinstance(event, yaml.ScalarEvent):
+        value = _construct_scalar(event)
+    elif isinstance(event, yaml.SequenceStartEvent):
+        value = []
+        event = next(events)
+        while not isinstance(event, yaml.SequenceEndEvent):
+            value.append(_build(events, event, keys, anchors))
+            event = next(events)
+    else:
+        value = {}
+        event = next(events)
+        while not isinstance(event, yaml.MappingEndEvent):
+            key = _build(events, event, None, anchors)
+            event = next(events)
+            if keys is None:
+                value[key] = _build(events, event, None, anchors)
+            elif isinstance(key, str) and key.lower() in keys:
+                value[key] = _build(events, event, keys[key.lower()], anchors)
+            else:
+                _skip(events, event)
+            event = next(events)
+
+    if anchor is not None:
+        anchors[anchor] = value
+    return value
+
+
+def iter_path(value, path, indices=()):
+    '''
+    Yields the list indices and the values at path (lower case keys and list indices)
+    in a loaded value. None in path stands for every item of a list, its index is
+    added to the yielded indices. A dict in path maps alternative keys to the rest of
+    the path, the position of the key present in the dict is added to the indices.
+    '''
+    if not path:
+        yield indices, value
+        return
+
+    key, path = path[0], path[1:]
+    if isinstance(value, list):
+        if key is None:
+            for index, item in enumerate(value):
+                yield from iter_path(item, path, indices + (index, ))
+        elif isinstance(key, int) and key < len(value):
+            yield from iter_path(value[key], path, indices)
+    elif isinstance(value, dict) and isinstance(key, str):
+        for name, item in value.items():
+            if isinstance(name, str) and name.lower() == key:
+                yield from iter_path(item, path, indices)
+    elif isinstance(value, dict) and isinstance(key, dict):
+        branches = list(key)
+        for name, item in value.items():
+            if isinstance(name, str) and name.lower() in key:
+                yield from iter_path(
+                    item, key[name.lower()], indices + (branches.index(name.lower()), ))
+
+
+class ItemStream:
+    '''
+    Iterates over the list indices and the values at path in the YAML data in
+    buffer[start:end] like iter_path, but building one value at a time from the parser
+    events. Of their mappings only the keys in the nested keys dict are built, e.g.
+    dict(energies=dict(ekin=None)), everything else is skipped as it is read. If the
+    data is truncated, the iteration stops after the last complete value and truncation
+    is the position relative to start where it ends.
+    '''
+    def __init__(self, buffer, path, keys=None, start=0, end=None):
+        self.buffer = buffer
+        self.start = start
+        self.end = len(buffer) if end is None else end
+        self.path = path
+        self.keys = keys
+        self.truncation = None
+        self._mark = None
+
+    def __iter__(self):
+        buffer, start, end = self.buffer, self.start, self.end
+        if end == start or buffer[end - 1:end] != b'\n':
+            end = _line_end(buffer, start, end)
+            self.truncation = end - start
+
+        events = yaml.parse(RangeReader(buffer, start, end), Loader=Loader)
+        self._mark = None
+        try:
+            event = next(events)
+            while not isinstance(event, yaml.DocumentStartEvent):
+                event = next(events)
+            yield from self._walk(events, next(events), self.path, (), dict())
+
+        except yaml.YAMLError as e:
+            error_mark = getattr(e, 'problem_mark', None)
+            if error_mark is None or _mark_position(buffer, error_mark, start) < _content_end(buffer, start, end):
+                raise
+            # the data ends within the value
+            self.truncation = (
+                _mark_position(buffer, self._mark, start) if self._mark is not None else end) - start
+
+    def _walk(self, events, event, path, indices, anchors):
+        # consumes the node that starts with event and yields the values at path in it
+        if not path:
+            self._mark = event.start_mark
+            value = _build(events, event, self.keys, anchors)
+            self._mark = None
+            yield indices, value
+            return
+
+        key = path[0]
+        if isinstance(event, yaml.SequenceStartEvent) and not isinstance(key, str):
+            event = next(events)
+            index = 0
+            while not isinstance(event, yaml.SequenceEndEvent):
+                if key is None:
+                    yield from self._walk(events, event, path[1:], indices + (index, ), anchors)
+                elif key == index:
+                    yield from self._walk(events, event, path[1:], indices, anchors)
+                else:
+                    _skip(events, event)
+                event = next(events)
+                index += 1
+
+        elif isinstance(event, yaml.MappingStartEvent) and isinstance(key, (str, dict)):
+            branches = list(key) if isinstance(key, dict) else None
+            event = next(events)
+            while not isinstance(event, yaml.MappingEndEvent):
+                name = _build(events, event, None, anchors)
+                event = next(events)
+                name = name.lower() if isinstance(name, str) else None
+                if name is not None and name == key:
+                    yield from self._walk(events, event, path[1:], indices, anchors)
+                elif branches is not None and name in key:
+                    yield from self._walk(
+                        events, event, key[name], indices + (branches.index(name), ), anchors)
+                else:
+                    _skip(events, event)
+                event = next(events)
+
+        else:
+            _skip(events, event)
+
+
+def read_atoms(data):
+    '''
+    Tokenizes the atom entries in the given raw section, e.g. "- N: [x, y, z]" or
+    "-  {N: [x, y, z]}", without building per atom python objects. Returns the labels,
+    the (N, 3) float64 array of vectors and data without the atom entries or None if
+    not all items in data are such entries.
+    '''
+    matches = re_atom.findall(data)
+    if len(matches) == 0 or len(matches) != len(re_item.findall(data)):
+        return None
+
+    labels = np.array([label for label, _ in matches]).astype(str)
+    try:
+        vectors = np.array(b','.join([vector for _, vector in matches]).split(b','), dtype=np.float64)
+    except ValueError:
+        return None
+    if vectors.size != 3 * len(labels):
+        return None
+
+    return labels, vectors.reshape((len(labels), 3)), re_atom.sub(b'', data)
+
+
+class LazyDocument(MutableMapping):
+    '''
+    A dict-like view on a single YAML document of a BigDFT log. The top-level sections
+    are indexed by their byte ranges and only loaded when they are accessed. If the
+    document is the last of the log, log_end is the position where the log ends, by
+    default the end of buffer if the indexed document reaches it.
+    '''
+    def __init__(
+            self, buffer, start=0, end=None, sections=None, instrumentation=None, tail=None,
+            log_end=None):
+        self._buffer = buffer
+        self._start = start
+        self._phase = instrumentation.phase if instrumentation is not None else _no_phase
+        # the key and log position of the last section if it might be truncated
+        self._tail = tail
+        if sections is None:
+            with self._phase('index', (len(buffer) if end is None else end) - start):
+                self._sections, self.end, complete = index_sections(buffer, start, end)
+            if not complete and self._sections:
+                key = next(reversed(self._sections))
+                self._tail = key, self._sections[key][0]
+        else:
+            self._sections, self.end = sections, len(buffer) if end is None else end
+        if log_end is None and sections is None and self.end == len(buffer):
+            log_end = self.end
+        self.log_end = log_end
+        self._data = dict()
+        self._document = None
+        self._section_cache = None
+        self._shared_keys = ()
+        self.truncation = None
+
+    def share_sections(self, section_cache, keys):
+        '''
+        Loads the sections with the given (lower case) keys through section_cache, so
+        that identical sections of other documents are only loaded once. Truncated
+        sections and sections that refer to anchors elsewhere are not shared.
+        '''
+        self._section_cache = section_cache
+        self._shared_keys = keys
+
+    def _load_section(self, key):
+        check_progress()
+        start, end = self._sections[key]
+        if self._tail is not None and self._tail[0] == key:
+            with self._phase('load', end - start):
+                data, position = load_partial(self._buffer, start, end)
+            if position is not None:
+                self.truncation = dict(section=key, position=self._tail[1] + position)
+            return list(data.values())[-1] if isinstance(data, dict) and data else None
+
+        try:
+            if self._section_cache is not None and key.lower() in self._shared_keys:
+                # the cache is keyed on the raw bytes, shared sections are small
+                data = self._buffer[start:end]
+                return self._section_cache.get(data, lambda: self._load(data, end - start))
+            return self._load(RangeReader(self._buffer, start, end), end - start)
+        except yaml.composer.ComposerError:
+            # aliases can refer to anchors defined in other sections
+            if self._document is None:
+                with self._phase('load', self.end - self._start):
+                    if self._tail is not None:
+                        self._document = load_partial(self._buffer, self._start, self.end)[0] or dict()
+                    else:
+                        self._document = yaml.load(
+                            RangeReader(self._buffer, self._start, self.end), Loader=Loader)
+            return self._document.get(key)
+
+    def _load(self, data, size):
+        with self._phase('load', size):
+            return load_section(data)
+
+    def raw(self, key):
+        '''
+        Returns a RangeReader over the unparsed bytes of the given section or None if it
+        is not available or was already loaded.
+        '''
+        if key in self._data or self._sections.get(key) is None:
+            return None
+        start, end = self._sections[key]
+        return RangeReader(self._buffer, start, end)
+
+    def truncate(self, key, position):
+        '''
+        Records that the raw section key (case-insensitive) ends at the given position
+        within it. Only the last section of a log can be truncated, elsewhere this is a
+        YAML error.
+        '''
+        if self._tail is None or self._tail[0].lower() != key.lower():
+            raise yaml.YAMLError('Unexpected end of section %s.' % key)
+        self.truncation = dict(section=self._tail[0], position=self._tail[1] + position)
+
+    def __getitem__(self, key):
+        if key not in self._data:
+            if key not in self._sections:
+                raise KeyError(key)
+            self._data[key] = self._load_section(key)
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        self._sections.setdefault(key, None)
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        del self._sections[key]
+        self._data.pop(key, None)
+
+    def __iter__(self):
+        return iter(list(self._sections.keys()))
+
+    def __len__(self):
+        return len(self._sections)
+
+    def __contains__(self, key):
+        return key in self._sections
+
+
+def iter_documents(buffer, start=0, end=None, instrumentation=None):
+    '''
+    Iterates over the YAML documents in buffer[start:end] without parsing them.
+    '''
+    end = len(buffer) if end is None else end
+    while start < end:
+        document = LazyDocument(buffer, start, end, instrumentation=instrumentation)
+        if len(document) > 0:
+            yield document
+        if document.end <= start:
+            break
+        start = document.end
+
+
+re_document = re.compile(rb'^(?:---|\.\.\.)', re.M)
+re_content = re.compile(rb'^(?!---|\.\.\.)[ \t]*[^\s#]', re.M)
+
+
+def split_documents(buffer):
+    '''
+    Returns the byte ranges of the YAML documents in buffer by only looking for the
+    document markers. Ranges without any content are skipped.
+    '''
+    boundaries = [0] + [match.start() for match in re_document.finditer(buffer)] + [len(buffer)]
+    return [
+        (start, end) for start, end in zip(boundaries[:-1], boundaries[1:])
+        if re_content.search(buffer, start, end) is not None]
+
+
+compressions = [(b'\x1f\x8b', gzip.open), (b'BZh', bz2.open), (b'\xfd7zXZ\x00', lzma.open)]
+
+
+def open_compressed(filepath):
+    '''
+    Returns a binary file object streaming the decompressed content if the file is
+    gzip, bzip2 or xz compressed and None otherwise.
+    '''
+    with open(filepath, 'rb') as f:
+        magic = f.read(6)
+
+    for prefix, open_file in compressions:
+        if magic.startswith(prefix):
+            return open_file(filepath, 'rb')
+
+    return None
+
+
+def stream_documents(f, keys=None, instrumentation=None):
+    '''
+    Iterates over the YAML documents read line by line from the binary file object f,
+    e.g. a decompression stream that cannot be memory-mapped. Only the raw bytes of the
+    top-level sections in keys (lower case) are kept, all others are skipped as they
+    are read.
+    '''
+    scanner = _Scanner()
+    sections = OrderedDict()
+    chunks = []
+    key, key_start, key_position, size, keep = None, 0, 0, 0, False
+    start, read, position = time.perf_counter(), 0, 0
+    line = b''
+
+    def document(tail=None, log_end=None):
+        if key is not None and keep:
+            sections[key] = (key_start, size)
+        if instrumentation is not None:
+            instrumentation.add('index', time.perf_counter() - start, read)
+        return LazyDocument(
+            b''.join(chunks), sections=sections, instrumentation=instrumentation, tail=tail,
+            log_end=log_end)
+
+    for line in f:
+        read += len(line)
+        position += len(line)
+        new_key = scanner.feed(line)
+        if new_key is _Scanner.document_end:
+            if len(sections) > 0 or (key is not None and keep):
+                yield document()
+            scanner = _Scanner()
+            sections = OrderedDict()
+            chunks = []
+            key, key_start, size, keep = None, 0, 0, False
+            start, read = time.perf_counter(), len(line)
+            scanner.feed(line)
+            continue
+
+        if new_key is not None:
+            if key is not None and keep:
+                sections[key] = (key_start, size)
+            key, key_start, key_position = new_key, size, position - len(line)
+            keep = keys is None or key.lower() in keys
+
+        if keep:
+            chunks.append(line)
+            size += len(line)
+
+    if len(sections) > 0 or (key is not None and keep):
+        complete = scanner.depth == 0 and line.endswith(b'\n')
+        yield document(tail=None if complete or not keep else (key, key_position), log_end=position)
@@ -16,10 +16,32 @@
 # limitations under the License.
 #
 
+import os
+import re
 import pytest
+import io
+import json
+import gzip
+import bz2
+import lzma
+import yaml
+import pickle
+import asyncio
+import sys
+import resource
+import subprocess
+import numpy as np
 
 from nomad.datamodel import EntryArchive
-from bigdftparser import BigDFTParser
+from bigdftparser import BigDFTParser, ResultCache, LogFollower, ScfHistory
+from bigdftparser.cache import SectionCache
+from bigdftparser.instrumentation import Instrumentation
+from bigdftparser.batch import find_mainfiles, parse_files, parse_file, _init_worker
+from bigdftparser import yaml_reader
+from bigdftparser.yaml_reader import LazyDocument, ItemStream, read_atoms
+from bigdftparser.bigdft_parser import extract_step, create_step_plan, scf_path, _ParseContext, _BudgetExceeded
+from bigdftparser.plan import Rule, Plan
+from bigdftparser.output import read_msgpack
 
 
 def approx(value, abs=0, rel=1e-6):
@@ -76,3 +98,628 @@ def test_3(parser):
 def test_4(parser):
     archive = EntryArchive()
     parser.parse('tests/data/output.out', archive, None)
+
+
+timings = '''---
+ INIT: #                   % ,  Time (s), Max, Min Load (relative)
+   Classes:
+     Potential         : [  73.2,  6.88E-01,  6.90E-01,  6.86E-01,  1.003,  0.997]
+     Total             : [ 100.0,  9.40E-01]
+   Categories: #Ordered by time consumption
+     PSolver Kernel Creation:
+       Data            : [  69.1,  6.50E-01,  6.51E-01,  6.49E-01,  1.001,  0.999]
+       Class           : Potential
+       Info            : ISF operations and creation of the kernel
+     Rho_comput:
+       Data            : [  10.0,  9.40E-02,  9.50E-02,  9.30E-02,  1.010,  0.990]
+       Class           : Convolutions
+ WFN_OPT:
+   Classes:
+     Total             : [ 100.0,  1.90E+00]
+   Categories:
+     Precondition:
+       Data            : [  50.0,  9.50E-01]
+       Class           : Convolutions
+ SUMMARY:
+   INIT                : [  33.1,  9.40E-01]
+   WFN_OPT             : [  66.9,  1.90E+00]
+'''
+
+
+def test_resources(parser, tmpdir):
+    archive = EntryArchive()
+    parser.parse('tests/data/n2_output.out', archive, None)
+
+    sec_run = archive.section_run[0]
+    sec_resources = sec_run.x_bigdft_section_resources
+    assert sec_resources.x_bigdft_mpi_tasks == 1
+    assert sec_resources.x_bigdft_openmp_threads == 8
+    assert list(sec_resources.x_bigdft_grid_points) == [30, 30, 35]
+    assert sec_resources.x_bigdft_grid_spacings[0].to('bohr').magnitude == approx(0.45)
+    assert sec_resources.x_bigdft_coarse_grid_points == 18172
+    assert sec_resources.x_bigdft_fine_grid_segments == 110
+    assert sec_resources.x_bigdft_kernel_memory.to('MiB').magnitude == approx(7.61)
+    assert sec_resources.x_bigdft_wavefunctions_memory.magnitude == 901 * 1024 + 816
+    assert sec_resources.x_bigdft_estimated_memory_peak.to('MiB').magnitude == approx(83)
+    assert sec_run.section_single_configuration_calculation[0].time_calculation.magnitude == approx(3.27)
+    assert len(sec_run.x_bigdft_section_timing) == 0
+
+    # the timings of a run without radical are read from the time.yaml next to the log
+    mainfile = str(tmpdir.join('log.yaml'))
+    with open('tests/data/n2_output.out', 'rb') as f:
+        tmpdir.join('log.yaml').write_binary(f.read())
+    tmpdir.join('time.yaml').write(timings)
+
+    archive = EntryArchive()
+    parser.parse(mainfile, archive, None)
+    sec_timings = archive.section_run[0].x_bigdft_section_timing
+    assert [sec_timing.x_bigdft_timing_counter for sec_timing in sec_timings] == ['INIT', 'WFN_OPT']
+    assert sec_timings[0].x_bigdft_timing_categories == ['PSolver Kernel Creation', 'Rho_comput']
+    assert sec_timings[0].x_bigdft_timing_classes == ['Potential', 'Convolutions']
+    assert sec_timings[0].x_bigdft_timing_times[0].magnitude == approx(0.65)
+    assert sec_timings[0].x_bigdft_timing_max_times[1].magnitude == approx(0.095)
+    assert sec_timings[0].x_bigdft_timing_total_time.magnitude == approx(0.94)
+    assert sec_timings[1].x_bigdft_timing_max_times is None
+    assert list(sec_timings[1].x_bigdft_timing_percents) == [50.0]
+
+    # categories with values that are not numbers are skipped
+    tmpdir.join('time.yaml').write(timings.replace('9.50E-01]', '"n/a"]').replace(
+        '[ 100.0,  9.40E-01]', '[ 100.0,  n/a]'))
+    archive = EntryArchive()
+    parser.parse(mainfile, archive, None)
+    assert len(archive.section_run[0].section_system) == 1
+    sec_timings = archive.section_run[0].x_bigdft_section_timing
+    assert sec_timings[0].x_bigdft_timing_total_time is None
+    assert not sec_timings[1].x_bigdft_timing_categories
+    assert sec_timings[1].x_bigdft_timing_total_time.magnitude == approx(1.9)
+
+    # the timings never fail the entry
+    tmpdir.join('time.yaml').write('INIT: {Categories: {a: {Data: [1, 2]}}, Classes: [1]}\n')
+    archive = EntryArchive()
+    parser.parse(mainfile, archive, None)
+    assert len(archive.section_run[0].section_system) == 1
+
+
+def test_lazy_document():
+    with open('tests/data/periodic.out', 'rb') as f:
+        data = f.read()
+
+    document = LazyDocument(data)
+    assert 'Code logo' in document
+    assert document['Version Number'] == 1.8
+    assert document['Atomic structure']['Cell'] == [7.0, 7.0, 7.0]
+    assert len(document._data) == 2
+    assert dict(document) == yaml.safe_load(data)
+
+
+def test_truncated(parser, tmpdir):
+    with open('tests/data/n2_output.out', 'rb') as f:
+        data = f.read()
+
+    # the job is killed while writing the fifth scf iteration
+    mainfile = str(tmpdir.join('truncated.out'))
+    with open(mainfile, 'wb') as f:
+        f.write(data[:data.index(b'iter: 5') + 40])
+
+    archive = EntryArchive()
+    parser.parse(mainfile, archive, None)
+
+    sec_run = archive.section_run[0]
+    assert sec_run.run_clean_end is False
+    assert sec_run.section_method[0].XC_functional == 'LDA_XC_TETER93'
+    assert sec_run.section_system[0].atom_labels[1] == 'N'
+    sec_scc = sec_run.section_single_configuration_calculation[0]
+    assert sec_scc.energy_total is None
+    assert len(sec_scc.section_scf_iteration) == 4
+
+    archive = EntryArchive()
+    BigDFTParser(scf_history=ScfHistory(last=2)).parse(mainfile, archive, None)
+    assert archive.section_run[0].run_clean_end is False
+    sec_scc = archive.section_run[0].section_single_configuration_calculation[0]
+    assert sec_scc.number_of_scf_iterations == 4
+    assert len(sec_scc.section_scf_iteration) == 2
+
+    # the job is killed after writing the first force, at a line boundary
+    end = data.index(b'\n', data.index(b'Atomic Forces (Ha/Bohr)') + 30) + 1
+    for compression in [None, gzip]:
+        mainfile = str(tmpdir.join('forces.out'))
+        with (compression or io).open(mainfile, 'wb') as f:
+            f.write(data[:end])
+        for n_processes in [1, 2]:
+            archive = EntryArchive()
+            BigDFTParser(n_processes=n_processes).parse(mainfile, archive, None)
+            sec_run = archive.section_run[0]
+            assert sec_run.run_clean_end is False
+            sec_scc = sec_run.section_single_configuration_calculation[0]
+            assert sec_scc.atom_forces is None
+            assert len(sec_scc.section_scf_iteration) == 11
+
+    document = LazyDocument(data[:data.index(b'iter: 5') + 40])
+    assert len(document['Ground State Optimization'][0]['Hamiltonian Optimization']) == 1
+
+    # the iterations are streamed from the range of the section in the log
+    end = data.index(b'iter: 5') + 40
+    reader = LazyDocument(data, 0, end).raw('Ground State Optimization')
+    iterations = ItemStream(data, scf_path, None, reader.start, reader.end)
+    assert len(list(iterations)) == 4
+    assert data[reader.start + iterations.truncation:end].startswith(b'{ #---')
+    assert document.truncation['section'] == 'Ground State Optimization'
+    assert data[document.truncation['position']:].startswith(b'{ #---')
+
+
+@pytest.mark.parametrize('scf_history, indices', [
+    (ScfHistory(), list(range(11))), (ScfHistory(last=3), [8, 9, 10]),
+    (ScfHistory(samples=4), [0, 4, 8, 10])])
+def test_scf_history(parser, scf_history, indices):
+    archive = EntryArchive()
+    parser.parse('tests/data/n2_output.out', archive, None)
+    sec_scc = archive.section_run[0].section_single_configuration_calculation[0]
+
+    streamed = EntryArchive()
+    BigDFTParser(scf_history=scf_history).parse('tests/data/n2_output.out', streamed, None)
+    sec_streamed = streamed.section_run[0].section_single_configuration_calculation[0]
+
+    assert sec_streamed.number_of_scf_iterations == sec_scc.number_of_scf_iterations == 11
+    assert [
+        sec_scf.energy_total_scf_iteration for sec_scf in sec_streamed.section_scf_iteration] == [
+        sec_scc.section_scf_iteration[n].energy_total_scf_iteration for n in indices]
+
+    scf = scf_history.collect(({'a': n} for n in range(1000)), ['a', 'b'])
+    assert scf['number_of_scf_iterations'] == 1000
+    assert list(scf['scf'].keys()) == ['a']
+    assert len(scf['scf_indices']) <= (scf_history.last or scf_history.samples or 1000) + 1
+    assert scf['scf_indices'][-1] == scf['scf']['a'][-1] == 999
+
+
+def test_scf_loops(parser, tmpdir):
+    with open('tests/data/n2_output.out') as f:
+        lines = f.readlines()
+
+    # a restarted run: two ground state loops, the first with two hamiltonian loops
+    start = lines.index(' Ground State Optimization:\n') + 1
+    end = lines.index(' Last Iteration                        : *FINAL001\n')
+    hamiltonian = [re.sub(r'&(\w+)', r'&\1b', line) for line in lines[start + 1:end]]
+    ground_state = [re.sub(r'&(\w+)', r'&\1c', line) for line in lines[start:end]]
+    mainfile = str(tmpdir.join('loops.out'))
+    with open(mainfile, 'w') as f:
+        f.writelines(lines[:end] + hamiltonian + ground_state + lines[end:])
+
+    step = extract_step(LazyDocument(open(mainfile, 'rb').read()))
+    loops = step['scc']['scf_loops']
+    assert list(loops['ground_state']) == [0] * 22 + [1] * 11
+    assert list(loops['kind']) == [0] * 33
+    assert list(loops['hamiltonian']) == [0] * 11 + [1] * 11 + [0] * 11
+    assert list(loops['iteration']) == list(range(11)) * 3
+
+    for scf_history in [None, ScfHistory()]:
+        archive = EntryArchive()
+        BigDFTParser(scf_history=scf_history).parse(mainfile, archive, None)
+        sec_scc = archive.section_run[0].section_single_configuration_calculation[0]
+        assert sec_scc.number_of_scf_iterations == 33
+        energies = [sec_scf.energy_total_scf_iteration for sec_scf in sec_scc.section_scf_iteration]
+        assert energies[:11] == energies[11:22] == energies[22:]
+        sec_scf = sec_scc.section_scf_iteration[12]
+        assert sec_scf.x_bigdft_scf_loop_kind == 'wavefunctions'
+        assert sec_scf.x_bigdft_scf_hamiltonian_loop == 1
+        assert sec_scf.x_bigdft_scf_iteration_index == 1
+
+    # a linear scaling run: support function and kernel loops in two outer loops
+    linear = [
+        ' Ground State Optimization:\n',
+        ' - support function optimization:\n',
+        '   - {iter: 1, fnrm: 1.0E-01, Omega: -19.5, D: -1.0E-02}\n',
+        '   - {iter: 2, fnrm: 5.0E-02, Omega: -19.6, D: -1.0E-02}\n',
+        '   kernel optimization:\n',
+        '   - {iter: 1, delta: 1.0E-03, energy: -19.80, D: -1.0E-02}\n',
+        ' - support function optimization:\n',
+        '   - {iter: 1, fnrm: 2.0E-02, Omega: -19.7, D: -1.0E-03}\n',
+        '   kernel optimization:\n',
+        '   - {iter: 1, delta: 1.0E-04, energy: -19.88, D: -1.0E-03}\n',
+        '   - {iter: 2, delta: 1.0E-05, energy: -19.883, D: -3.0E-03}\n']
+    with open(mainfile, 'w') as f:
+        f.writelines(lines[:start - 1] + linear + lines[end:])
+
+    for scf_history in [None, ScfHistory()]:
+        step = extract_step(LazyDocument(open(mainfile, 'rb').read()), create_step_plan(scf_history))
+        loops = step['scc']['scf_loops']
+        assert list(loops['ground_state']) == [0, 0, 0, 1, 1, 1]
+        assert list(loops['kind']) == [1, 1, 2, 1, 2, 2]
+        assert list(loops['hamiltonian']) == [0] * 6
+        assert list(loops['iteration']) == [0, 1, 0, 0, 0, 1]
+        assert list(step['scc']['scf']['energy_change']) == [-1e-2, -1e-2, -1e-2, -1e-3, -1e-3, -3e-3]
+
+        archive = EntryArchive()
+        BigDFTParser(scf_history=scf_history).parse(mainfile, archive, None)
+        sec_scfs = archive.section_run[0].section_single_configuration_calculation[0].section_scf_iteration
+        assert [sec_scf.x_bigdft_scf_loop_kind for sec_scf in sec_scfs] == [
+            'support_functions', 'support_functions', 'kernel'] + ['support_functions'] + ['kernel'] * 2
+        assert sec_scfs[0].energy_total_scf_iteration is None
+        assert sec_scfs[5].energy_total_scf_iteration.to('hartree').magnitude == approx(-19.883)
+
+
+def test_plan():
+    plan = Plan([
+        Rule('cell', [('Atomic structure', 'cell'), ('sizes', 'angstroem')], convert=len),
+        Rule('charge', [('dft', 'qcharge')], default=0),
+        Rule('first', [('items', 1, 'value')])])
+
+    values = plan.extract({
+        'SIZES': {'Angstroem': [1, 2, 3]}, 'atomic structure': {'Cell': [1, 2]},
+        'items': [{'value': 0}, {'Value': 1}]})
+    assert values == dict(cell=2, charge=0, first=1)
+    assert plan.extract({'sizes': {'angstroem': [1, 2, 3]}})['cell'] == 3
+
+
+@pytest.fixture
+def multiple_documents(tmpdir):
+    mainfile = str(tmpdir.join('geopt.out'))
+    with open(mainfile, 'w') as f:
+        for filename in ['n2_output.out', 'periodic.out', 'n2_output.out']:
+            with open('tests/data/%s' % filename) as log:
+                f.write(log.read())
+    return mainfile
+
+
+def test_multiple_documents(parser, multiple_documents):
+    mainfile = multiple_documents
+    archive = EntryArchive()
+    parser.parse(mainfile, archive, None)
+
+    sec_run = archive.section_run[0]
+    assert len(sec_run.section_method) == 1
+    sec_systems = sec_run.section_system
+    assert len(sec_systems) == 3
+    assert sec_systems[1].lattice_vectors[0][0].magnitude == approx(7e-10)
+    sec_sccs = sec_run.section_single_configuration_calculation
+    assert len(sec_sccs) == 3
+    assert sec_sccs[1].single_configuration_calculation_to_system_ref == sec_systems[1]
+    assert len(sec_sccs[2].section_scf_iteration) == 11
+
+
+def test_parallel(parser, multiple_documents, tmpdir):
+    # documents without sections, e.g. a line of text, are skipped as in serial parsing
+    with open(multiple_documents) as f:
+        log = f.read()
+    tmpdir.join('text.out').write('not a BigDFT log\n')
+    tmpdir.join('prefixed.out').write('not a BigDFT log\n---\n' + log)
+
+    for mainfile in [multiple_documents, str(tmpdir.join('text.out')), str(tmpdir.join('prefixed.out'))]:
+        archive = EntryArchive()
+        parser.parse(mainfile, archive, None)
+
+        archive_parallel = EntryArchive()
+        BigDFTParser(n_processes=2).parse(mainfile, archive_parallel, None)
+
+        assert archive_parallel.m_to_dict() == archive.m_to_dict()
+
+
+def test_carried_system(tmpdir):
+    from benchmarks.synthetic_log import generate
+
+    # only the first document of a geometry optimization gives the system properties
+    mainfile = str(tmpdir.join('steps.out'))
+    with open(mainfile, 'w') as f:
+        generate(f, n_atoms=8, n_steps=3, bc='free')
+    with open(mainfile, 'rb') as f, gzip.open(mainfile + '.gz', 'wb') as f_gz:
+        f_gz.write(f.read())
+
+    for path, n_processes in [(mainfile, 1), (mainfile, 2), (mainfile + '.gz', 1)]:
+        archive = EntryArchive()
+        BigDFTParser(n_processes=n_processes).parse(path, archive, None)
+        sec_systems = archive.section_run[0].section_system
+        assert len(sec_systems) == 3
+        for sec_system in sec_systems:
+            assert sec_system.number_of_atoms == 8
+            assert not any(sec_system.configuration_periodic_dimensions)
+
+
+def test_read_atoms():
+    with open('tests/data/n2_output.out', 'rb') as f:
+        document = LazyDocument(f.read())
+
+    labels, forces, remainder = read_atoms(document.raw('Atomic Forces (Ha/Bohr)').read())
+    assert list(labels) == ['N', 'N']
+    assert forces.shape == (2, 3)
+    assert forces[1][2] == approx(-5.670554140677E-02)
+    assert yaml.safe_load(remainder) == {'Atomic Forces (Ha/Bohr)': None}
+
+    labels, positions, remainder = read_atoms(document.raw('Atomic structure').read())
+    assert positions[1][2] == approx(4.724765534)
+    assert yaml.safe_load(remainder)['Atomic structure']['Units'] == 'angstroem'
+
+    assert read_atoms(document.raw('Atomic System Properties').read()) is None
+
+
+@pytest.mark.parametrize('compression', [gzip, bz2, lzma])
+def test_compressed(parser, multiple_documents, compression):
+    archive = EntryArchive()
+    parser.parse(multiple_documents, archive, None)
+
+    mainfile = '%s.%s' % (multiple_documents, compression.__name__)
+    with open(multiple_documents, 'rb') as f:
+        with compression.open(mainfile, 'wb') as f_compressed:
+            f_compressed.write(f.read())
+
+    archive_compressed = EntryArchive()
+    parser.parse(mainfile, archive_compressed, None)
+
+    assert len(archive_compressed.section_run[0].section_system) == 3
+    assert archive_compressed.m_to_dict() == archive.m_to_dict()
+
+
+def test_cache(parser, multiple_documents, tmpdir):
+    cache = ResultCache(str(tmpdir.join('cache')))
+    cached_parser = BigDFTParser(cache=cache)
+
+    archive = EntryArchive()
+    parser.parse(multiple_documents, archive, None)
+    for _ in range(2):
+        archive_cached = EntryArchive()
+        cached_parser.parse(multiple_documents, archive_cached, None)
+        assert archive_cached.m_to_dict() == archive.m_to_dict()
+
+    key = cache.key(multiple_documents)
+    records = list(cache.get(key))
+    assert len(records) == 4
+    assert records[0]['program_version'] == '1.8'
+    assert cache.get(cache.key('tests/data/n2_output.out')) is None
+    # entries of parsers with another record format are not reused
+    assert ResultCache(str(tmpdir.join('cache')), version='1.0').key(multiple_documents) != key
+
+    # a corrupted entry is removed and the log is parsed again
+    path = str(tmpdir.join('cache', '%s.pickle' % key))
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:len(data) // 2])
+    archive_cached = EntryArchive()
+    cached_parser.parse(multiple_documents, archive_cached, None)
+    assert archive_cached.m_to_dict() == archive.m_to_dict()
+    assert len(cache.get(key)) == 4
+
+    cache.max_size = 0
+    cache.evict()
+    assert cache.get(key) is None
+
+
+@pytest.mark.parametrize('budget', [dict(max_size=1000), dict(max_time=0), dict(max_memory=-1)])
+def test_budget(budget):
+    archive = EntryArchive()
+    BigDFTParser(**budget).parse('tests/data/n2_output.out', archive, None)
+
+    assert len(archive.section_run) == 1
+    sec_run = archive.section_run[0]
+    assert sec_run.program_version == '1.8'
+    assert sec_run.parsing_message_warning_run.startswith('partially parsed')
+    assert sec_run.run_hosts is None
+    assert sec_run.x_bigdft_section_resources.x_bigdft_mpi_tasks == 1
+    assert sec_run.x_bigdft_section_resources.x_bigdft_openmp_threads == 8
+    assert sec_run.section_method[0].section_XC_functionals[0].XC_functional_name == 'LDA_XC_TETER93'
+    assert sec_run.section_system[0].number_of_atoms == 2
+    sec_scc = sec_run.section_single_configuration_calculation[0]
+    assert sec_scc.energy_total.magnitude == approx(-8.66869132e-17)
+    assert len(sec_scc.section_scf_iteration) == 0
+
+    archive = EntryArchive()
+    BigDFTParser(max_size=1 << 30, max_time=60).parse('tests/data/n2_output.out', archive, None)
+    assert archive.section_run[0].parsing_message_warning_run is None
+    assert len(archive.section_run[0].section_single_configuration_calculation[0].section_scf_iteration) == 11
+
+
+@pytest.mark.parametrize('scf_history', [None, ScfHistory(last=2)])
+def test_budget_within_document(scf_history, tmpdir, monkeypatch):
+    from benchmarks.synthetic_log import generate
+
+    # a single ionic step with a long scf history
+    mainfile = str(tmpdir.join('large.out'))
+    with open(mainfile, 'w') as f:
+        generate(f, n_scf=500)
+
+    # the budget is exceeded at the third check while the step is extracted, this is
+    # never reached if the budget is only checked between the documents
+    checks = []
+
+    def check_budget(self):
+        frame = sys._getframe()
+        while frame is not None and frame.f_code.co_name != 'extract_step':
+            frame = frame.f_back
+        if frame is not None:
+            checks.append(True)
+            if len(checks) == 3:
+                raise _BudgetExceeded('time')
+
+    monkeypatch.setattr(_ParseContext, 'check_budget', check_budget)
+    archive = EntryArchive()
+    BigDFTParser(scf_history=scf_history).parse(mainfile, archive, None)
+    assert len(checks) == 3
+    assert archive.section_run[0].parsing_message_warning_run == 'partially parsed, the time budget is exceeded'
+
+
+def test_section_cache():
+    parser = BigDFTParser()
+    uncached_parser = BigDFTParser(section_cache_size=0)
+    for mainfile in ['tests/data/n2_output.out', 'tests/data/output.out', 'tests/data/n2_output.out']:
+        archive, archive_uncached = EntryArchive(), EntryArchive()
+        parser.parse(mainfile, archive, None)
+        uncached_parser.parse(mainfile, archive_uncached, None)
+        assert archive.m_to_dict() == archive_uncached.m_to_dict()
+
+    # the input sections of the first log are reused by the others
+    assert parser.section_cache.misses == 2
+    assert parser.section_cache.hits == 4
+    assert uncached_parser.section_cache.size == 0
+
+    cache = SectionCache(max_size=10)
+    for data in [b'a: 1\n', b'b: 2\n', b'a: 1\n', b'c: 3\n']:
+        cache.get(data, lambda: data)
+    assert cache.hits == 1 and cache.size == 10
+    assert cache.get(b'b: 2\n', lambda: None) is None
+
+
+def test_batch(tmpdir):
+    with open('tests/data/n2_output.out', 'rb') as f:
+        with gzip.open(str(tmpdir.join('n2_output.out.gz')), 'wb') as f_compressed:
+            f_compressed.write(f.read())
+    tmpdir.join('notes.txt').write('not a BigDFT log')
+
+    mainfiles = list(find_mainfiles([str(tmpdir), 'tests/data/periodic.out']))
+    assert [os.path.basename(mainfile) for mainfile in mainfiles] == ['n2_output.out.gz', 'periodic.out']
+
+    f_out = io.StringIO()
+    parse_files(mainfiles, f_out, n_processes=1)
+    entries = [json.loads(line) for line in f_out.getvalue().splitlines()]
+    assert len(entries) == 2
+    assert all(entry['status'] == 'success' for entry in entries)
+    assert entries[0]['archive']['section_run'][0]['program_version'] == '1.8'
+
+    f_out = io.StringIO()
+    parse_files(mainfiles[1:], f_out, n_processes=1, max_size=1000)
+    assert json.loads(f_out.getvalue())['status'] == 'partial'
+
+
+def test_batch_output(tmpdir):
+    with open('tests/data/periodic.out') as f:
+        log = f.read()
+    mainfiles = [
+        str(tmpdir.join('a_b', 'c.out')), str(tmpdir.join('a', 'b_c.out')),
+        str(tmpdir.join('x' * 200, 'y' * 200 + '.out'))]
+    for mainfile in mainfiles:
+        os.makedirs(os.path.dirname(mainfile))
+        with open(mainfile, 'w') as f:
+            f.write(log)
+
+    output_directory = str(tmpdir.join('archives'))
+    f_out = io.StringIO()
+    parse_files(mainfiles, f_out, n_processes=1, output_directory=output_directory)
+    entries = [json.loads(line) for line in f_out.getvalue().splitlines()]
+    assert all(entry['status'] == 'success' for entry in entries)
+    assert len(set(entry['output'] for entry in entries)) == 3
+    assert len(os.listdir(output_directory)) == 3
+
+    _init_worker()
+    entry = json.loads(parse_file(mainfiles[0], str(tmpdir.join('missing'))))
+    assert entry['status'] == 'failure' and 'output' not in entry
+    assert entry['errors'][0].startswith('FileNotFoundError')
+
+
+def test_msgpack(parser, tmpdir):
+    f_out = io.StringIO()
+    parse_files(
+        ['tests/data/periodic.out'], f_out, n_processes=1, output_directory=str(tmpdir),
+        output_format='msgpack')
+    entry = json.loads(f_out.getvalue())
+    assert entry['output'].endswith('.msgpack')
+
+    with open(entry['output'], 'rb') as f:
+        data = read_msgpack(f)
+    positions = data['section_run'][0]['section_system'][0]['atom_positions']
+    assert positions.dtype == np.float64 and positions.shape == (2, 3)
+
+    archive = EntryArchive()
+    parser.parse('tests/data/periodic.out', archive, None)
+
+    def to_lists(value):
+        if isinstance(value, dict):
+            return {key: to_lists(val) for key, val in value.items()}
+        if isinstance(value, list):
+            return [to_lists(val) for val in value]
+        return value.tolist() if isinstance(value, np.ndarray) else value
+
+    assert to_lists(data) == archive.m_to_dict()
+
+
+def test_instrumentation(tmpdir):
+    parser = BigDFTParser(profile=['scc'], profile_directory=str(tmpdir))
+    parser.parse('tests/data/n2_output.out', EntryArchive(), None)
+
+    phases = parser.instrumentation.phases
+    assert set(phases.keys()) == {'index', 'load', 'method', 'step', 'system', 'scc', 'references'}
+    assert phases['index']['bytes'] == os.path.getsize('tests/data/n2_output.out')
+    assert phases['load']['count'] == 17
+    assert parser.instrumentation.fields()['total_time'] > 0
+    assert tmpdir.join('n2_output.out.scc.prof').check()
+
+    # the memory is sampled at the phase boundaries and exclusive of nested phases
+    instrumentation = Instrumentation()
+    with instrumentation.phase('outer'):
+        with instrumentation.phase('inner'):
+            data = b'x' * (64 << 20)
+        with instrumentation.phase('other'):
+            pass
+        del data
+    phases = instrumentation.phases
+    assert phases['inner']['rss_increase'] > 48 << 20
+    assert phases['outer']['rss_increase'] < 16 << 20
+    assert phases['other']['rss_increase'] < 16 << 20
+
+    # the process peak is not reset
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    parser.parse('tests/data/n2_output.out', EntryArchive(), None)
+    assert resource.getrusage(resource.RUSAGE_SELF).ru_maxrss >= peak
+
+    parser = BigDFTParser(phase_memory=False)
+    parser.parse('tests/data/n2_output.out', EntryArchive(), None)
+    assert all(phase['rss_increase'] == 0 for phase in parser.instrumentation.phases.values())
+
+
+def test_follow(parser, multiple_documents, tmpdir, monkeypatch):
+    with open(multiple_documents, 'rb') as f:
+        data = f.read()
+
+    # the scf sections are not loaded again once a document is complete
+    loaded = []
+    load_section = yaml_reader.load_section
+
+    def load(data):
+        data = data.read() if hasattr(data, 'read') else data
+        loaded.append(data)
+        return load_section(data)
+
+    monkeypatch.setattr(yaml_reader, 'load_section', load)
+
+    mainfile = str(tmpdir.join('running.out'))
+    follower = LogFollower(mainfile, parser=parser)
+    records = []
+    for position in range(0, len(data), 4096):
+        with open(mainfile, 'wb') as f:
+            f.write(data[:position + 4096])
+        # the state can be stored between updates
+        follower = LogFollower(mainfile, parser=parser, state=pickle.loads(pickle.dumps(follower.state)))
+        records.extend(follower.update())
+    records.extend(follower.update(final=True))
+
+    assert records[0]['program_version'] == '1.8'
+    steps = [record for record in records if 'system' in record]
+    assert len(steps) == 3
+    iterations = [record for record in records if 'first_iteration' in record and record['step'] == 2]
+    assert sum(record['number_of_scf_iterations'] for record in iterations) == 11
+    assert iterations[-1]['scf']['energy_total'][-1] == approx(steps[2]['scc']['scf']['energy_total'][-1])
+    assert len(loaded) > 0
+    assert not any(data.lstrip().startswith(b'Ground State Optimization') for data in loaded)
+    assert list(steps[1]['scc']['scf_loops']['iteration']) == list(range(steps[1]['scc']['number_of_scf_iterations']))
+
+
+def test_concurrent(parser):
+    mainfiles = ['tests/data/%s' % name for name in [
+        'n2_output.out', 'periodic.out', 'libxc_101130.out', 'output.out'] * 4]
+    expected = dict()
+    for mainfile in mainfiles[:4]:
+        archive = EntryArchive()
+        parser.parse(mainfile, archive, None)
+        expected[mainfile] = archive.m_to_dict()
+
+    async def parse_all():
+        archives = [EntryArchive() for _ in mainfiles]
+        await asyncio.gather(*[
+            parser.parse_async(mainfile, archive) for mainfile, archive in zip(mainfiles, archives)])
+        return archives
+
+    archives = asyncio.run(parse_all())
+    for mainfile, archive in zip(mainfiles, archives):
+        assert archive.m_to_dict() == expected[mainfile]
+
+
+def test_lazy_import():
+    # matchers and workers only pay for the modules they use
+    code = 'import sys, bigdftparser; print(sorted(set(sys.modules) & {"nomad", "yaml", "numpy", "ase"}))'
+    assert subprocess.check_output([sys.executable, '-c', code]).decode().strip() == '[]'